@@ -1,29 +1,81 @@
 """Program that makes a brownian tree with two roots. You can vary the distance
-between the roots, the window size, and the size of the particles"""
+between the roots, the window size, and the size of the particles
+
+Importing it (benchmarks/suite.py does) skips the input box and doesn't start
+the simulation; that only happens when it is run. Run it with --headless to
+grow a tree without a window and write it out (see headless.py)."""
 
-import Brownian_tree_input
 import pygame, sys, os
 from pygame.locals import *  
 from random import randint
+import time
+import perf
+from tree_bitmap import TreeBitmap
+from particle_grid import ParticleGrid
+from swarm import Swarm
+from dla_swarm import DLASwarm
+from renderer import Renderer
+import headless
+import random
 
 # global variables
 WINDOWSIZE = 300
 MAXSPEED = 10
 SIZE = 3
 COLOR = (255,255,0)
-TIMETICK = 1
+# the simulation runs in steps, not on a timer: STEPS_PER_FRAME steps
+# between frames, or if it is None as many as fit in STEP_BUDGET
+# milliseconds, with new particles every SPAWN_EVERY steps. How far the
+# tree gets in so many steps doesn't depend on how fast the computer is.
+STEPS_PER_FRAME = None
+STEP_BUDGET = 12
+SPAWN_EVERY = 50
 MAXPART = 50
+# the free particles are the original sprites, one Particle each. With
+# SWARM (or --swarm) they are all stepped together in NumPy arrays instead
+# (see swarm.py) and there can be SWARM_MAXPART of them. That goes past
+# 100000, but a window that crowded grows a blob rather than a tree.
+SWARM = False
+SWARM_MAXPART = 200
+# with DLA (or --dla) the swarm's particles are DLA walkers instead: they
+# start on a circle just round the tree and jump wherever the tree is far
+# away, so it grows many times quicker (see dla_swarm.py). It turns on
+# SWARM as well.
+DLA = False
+# most frames drawn a second, however fast the simulation ticks
+FPS = 60
+# press p for ticks per second, free particles and tree size in the window
+# caption (see perf.py). Set PERF_LOG to a .csv or .jsonl file to start with
+# them on and have them written there every second.
+PERF_LOG = None
 # defualt distance between two roots.
 default_distance = 50
+# the command line options when it is run, and the random seed from them
+args = None
+SEED = None
 
-# calls input textbox as above, a massive variable name!
-params = Brownian_tree_input.input_variables(WINDOWSIZE,
-                                             SIZE,
-                                             default_distance)
+if __name__ == "__main__":
+    args = headless.parse_args("Grow a Brownian tree from two roots.",
+                               [("window", WINDOWSIZE, "window size in pixels"),
+                                ("size", SIZE, "particle size in pixels"),
+                                ("distance", default_distance,
+                                 "distance between the roots")])
+    SEED = args.seed
+    DLA = DLA or args.dla
+    SWARM = SWARM or args.swarm or DLA
+    random.seed(SEED)
+    if args.headless:
+        params = args.params
+    else:
+        # calls input textbox as above, a massive variable name!
+        # the options are its defaults. tkinter is only needed for this,
+        # so it isn't imported headless.
+        import Brownian_tree_input
+        params = Brownian_tree_input.input_variables(*args.params)
 
-WINDOWSIZE = params[0]
-SIZE = params[1]
-default_distance = params[2]
+    WINDOWSIZE = params[0]
+    SIZE = params[1]
+    default_distance = params[2]
 # pygame initialization lines
 pygame.init()
 pygame.display.set_caption("Brownian Tree Two Roots")
@@ -39,6 +91,22 @@ tenth = WINDOWSIZE/10
 # if they are tree they stop
 freeParticles = pygame.sprite.Group()
 tree = pygame.sprite.Group()
+# the free particles again, sorted into a grid so each one only has to
+# look at its neighbors to see if it has bumped into another one (see
+# particle_grid.py)
+free_grid = ParticleGrid(SIZE)
+# the tree again as a bitmap, so a particle can find out if it has hit the
+# tree by looking at the pixels under it instead of at every particle in
+# the tree (see tree_bitmap.py)
+tree_bitmap = TreeBitmap(WINDOWSIZE, WINDOWSIZE, MAXSPEED + SIZE)
+if DLA:
+    swarm = DLASwarm(WINDOWSIZE, WINDOWSIZE, SIZE, MAXSPEED, tree_bitmap,
+                     (center, center), None, SEED)
+else:
+    swarm = Swarm(WINDOWSIZE, WINDOWSIZE, SIZE, MAXSPEED, tree_bitmap, SEED)
+# draws the swarm and the tree (see renderer.py); the sprites draw
+# themselves and only use it to flip the display
+renderer = Renderer(screen, tree_bitmap, COLOR, COLOR)
 
 # particle class, from which all the particles get characteristics  
 class Particle(pygame.sprite.Sprite):
@@ -49,6 +117,7 @@ class Particle(pygame.sprite.Sprite):
         self.accelerate(vector)
         self.add(freeParticles)
         self.rect = pygame.Rect(location[0], location[1], SIZE, SIZE)
+        free_grid.add(self)
         self.surface.fill(COLOR, self.rect)
  
     def onEdge(self):
@@ -64,15 +133,11 @@ class Particle(pygame.sprite.Sprite):
     def update(self):
         if freeParticles in self.groups():
             self.surface.fill((0,0,0), self.rect)
-            self.remove(freeParticles)
-            if pygame.sprite.spritecollideany(self, freeParticles):
+            if free_grid.collideany(self):
                 self.accelerate((randint(-MAXSPEED, MAXSPEED), 
                                  randint(-MAXSPEED, MAXSPEED)))
-                self.add(freeParticles)
-            elif pygame.sprite.spritecollideany(self, tree):
+            elif tree_bitmap.hits(self.rect):
                 self.stop()
-            else:
-                self.add(freeParticles)
  
             self.onEdge()
  
@@ -80,74 +145,163 @@ class Particle(pygame.sprite.Sprite):
                 self.accelerate((randint(-MAXSPEED, MAXSPEED), 
                                  randint(-MAXSPEED, MAXSPEED)))
             self.rect.move_ip(self.vector[0], self.vector[1])
+            if tree not in self.groups():
+                free_grid.move(self)
         self.surface.fill(COLOR, self.rect)
  
     def stop(self):
         self.vector = (0,0)
         self.remove(freeParticles)
         self.add(tree)
+        tree_bitmap.add(self.rect)
+        free_grid.remove(self)
  
     def accelerate(self, vector):
         self.vector = vector
  
-NEW = USEREVENT + 1
-TICK = USEREVENT + 2
- 
-pygame.time.set_timer(NEW, 50)
-pygame.time.set_timer(TICK, TIMETICK)
+PERF = USEREVENT + 3
+# steps taken so far
+steps = 0
+
+# nothing is measured while these are None
+perf_stats = None
+perf_log = None
+caption = ""
+
+def toggle_perf():
+    global perf_stats, caption
+    if perf_stats is None:
+        caption = pygame.display.get_caption()[0]
+        perf_stats = perf.Stats()
+        if SWARM:
+            perf_stats.wrap(swarm, "step", counter="ticks", timer="update")
+            perf_stats.wrap(renderer, "draw", counter="frames", timer="draw")
+        else:
+            perf_stats.wrap(freeParticles, "update", counter="ticks", timer="update")
+        pygame.time.set_timer(PERF, 1000)
+    else:
+        pygame.time.set_timer(PERF, 0)
+        perf_stats.unwrap()
+        perf_stats = None
+        pygame.display.set_caption(caption)
+
+def show_perf():
+    if SWARM:
+        row = perf_stats.sample({"free": len(swarm),
+                                 "tree": len(tree) + swarm.stuck})
+    else:
+        row = perf_stats.sample({"free": len(freeParticles), "tree": len(tree)})
+    pygame.display.set_caption(caption + " | " + ", ".join(perf.describe(row)))
+    if perf_log is not None:
+        perf_log.write(row)
  
+# new free particles, every SPAWN_EVERY steps (every step for DLA walkers)
+def spawn():
+    if SWARM and DLA:
+        swarm.launch(SWARM_MAXPART - len(swarm))
+    elif SWARM:
+        # all the particles the swarm is short of at once, in the same
+        # four corners as below
+        swarm.spawn_corners(SWARM_MAXPART - len(swarm), tenth, tenth)
+    elif len(freeParticles) < MAXPART:
+        # make the particles appear away from the center
+        # give four corners for Particles to appear
+        rand = randint(1, 4)
+        
+        if rand == 1:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                      randint(-MAXSPEED,MAXSPEED)),
+                     (randint(0, tenth), randint(0, tenth)), 
+                     screen)
+        elif rand == 2:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                     randint(-MAXSPEED,MAXSPEED)),
+                     (randint(WINDOWSIZE - tenth, WINDOWSIZE),
+                      randint(WINDOWSIZE - tenth, WINDOWSIZE)), 
+                      screen)
+        elif rand == 3:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                     randint(-MAXSPEED,MAXSPEED)),
+                     (randint(WINDOWSIZE - tenth, WINDOWSIZE),
+                      randint(0, tenth)), 
+                      screen)
+        elif rand == 4:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                     randint(-MAXSPEED,MAXSPEED)),
+                     (randint(0, tenth),
+                      randint(WINDOWSIZE - tenth, WINDOWSIZE)), 
+                      screen)
+
+# one step of the simulation: new particles when it's time for them, then
+# every free particle moves once
+def step():
+    global steps
+    if DLA or steps % SPAWN_EVERY == 0:
+        spawn()
+    if SWARM:
+        swarm.step()
+    else:
+        freeParticles.update()
+    steps += 1
+
+# the steps between two frames: STEPS_PER_FRAME of them, or as many as fit
+# in STEP_BUDGET milliseconds
+def run_steps():
+    if STEPS_PER_FRAME:
+        for i in range(STEPS_PER_FRAME):
+            step()
+    else:
+        deadline = time.perf_counter() + STEP_BUDGET/1000.0
+        while time.perf_counter() < deadline:
+            step()
+
 def input(events):
     for event in events:
         if event.type == QUIT:
             pygame.quit(), sys.exit(0)
-        elif event.type == NEW and (len(freeParticles) < MAXPART):
-            # make the particles appear away from the center
-            # give four corners for Particles to appear
-            rand = randint(1, 4)
-            
-            if rand == 1:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                          randint(-MAXSPEED,MAXSPEED)),
-                         (randint(0, tenth), randint(0, tenth)), 
-                         screen)
-            elif rand == 2:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                         randint(-MAXSPEED,MAXSPEED)),
-                         (randint(WINDOWSIZE - tenth, WINDOWSIZE),
-                          randint(WINDOWSIZE - tenth, WINDOWSIZE)), 
-                          screen)
-            elif rand == 3:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                         randint(-MAXSPEED,MAXSPEED)),
-                         (randint(WINDOWSIZE - tenth, WINDOWSIZE),
-                          randint(0, tenth)), 
-                          screen)
-            elif rand == 4:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                         randint(-MAXSPEED,MAXSPEED)),
-                         (randint(0, tenth),
-                          randint(WINDOWSIZE - tenth, WINDOWSIZE)), 
-                          screen)
-                
-        elif event.type == TICK:
-            freeParticles.update()
-
-# if the distance will be outside the window, sets it to right at the
-# window size
-distance_between_roots = default_distance
-distance_between_roots = int(distance_between_roots)
-if distance_between_roots > WINDOWSIZE:
-    distance_between_roots = WINDOWSIZE - SIZE 
-
-# place roots 
-root1 = Particle((0,0), (center + distance_between_roots/2, center),
-                         screen)
-root2 = Particle((0,0), (center - distance_between_roots/2, center),
-                         screen)
-
-root1.stop()
-root2.stop()
-
-while True:
-    input(pygame.event.get())
-    pygame.display.flip()
+        elif event.type == KEYDOWN and event.key == K_p:
+            toggle_perf()
+        elif event.type == PERF and perf_stats is not None:
+            show_perf()
+
+if __name__ == "__main__":
+    if PERF_LOG is not None:
+        perf_log = perf.PerfLog(PERF_LOG)
+        toggle_perf()
+
+    # if the distance will be outside the window, sets it to right at the
+    # window size
+    distance_between_roots = default_distance
+    distance_between_roots = int(distance_between_roots)
+    if distance_between_roots > WINDOWSIZE:
+        distance_between_roots = WINDOWSIZE - SIZE 
+
+    # place roots 
+    root1 = Particle((0,0), (center + distance_between_roots/2, center),
+                             screen)
+    root2 = Particle((0,0), (center - distance_between_roots/2, center),
+                             screen)
+
+    root1.stop()
+    root2.stop()
+
+    if args.headless:
+        steps, seconds = headless.run(step, lambda: len(tree) + swarm.stuck,
+                                      args.particles, args.seconds)
+        headless.save(args.output, renderer.tree_surface(), tree_bitmap,
+                      steps, seconds)
+        print("%d particles in %d steps, %.1f s, written to %s.png and %s.npz"
+              % (len(tree) + swarm.stuck, steps, seconds, args.output,
+                 args.output))
+        sys.exit(0)
+
+    clock = pygame.time.Clock()
+    while True:
+        input(pygame.event.get())
+        run_steps()
+        if SWARM:
+            renderer.draw(swarm)
+        else:
+            renderer.flip()
+        # no more than FPS frames a second
+        clock.tick(FPS)
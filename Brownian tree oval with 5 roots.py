@@ -1,17 +1,48 @@
 import pygame, sys, os
 from pygame.locals import *  
 from random import randint
-import Brownian_tree_input2
+import time
+import perf
+from tree_bitmap import TreeBitmap
+from particle_grid import ParticleGrid
+from swarm import Swarm
+from dla_swarm import DLASwarm
+from renderer import Renderer
+from boundary import ellipse_boundary, image_boundary
+import headless
+import random
 import math
-pygame.init()
 
 window_width = 400
 window_height = 300
 MAXSPEED = 10
 SIZE = 4 #particle size
 COLOR = (105,105,105)
-TIMETICK = 1
+# the simulation runs in steps, not on a timer: STEPS_PER_FRAME steps
+# between frames, or if it is None as many as fit in STEP_BUDGET
+# milliseconds, with new particles every SPAWN_EVERY steps. How far the
+# tree gets in so many steps doesn't depend on how fast the computer is.
+STEPS_PER_FRAME = None
+STEP_BUDGET = 12
+SPAWN_EVERY = 50
 MAXPART = 50
+# the free particles are the original sprites, one Particle each. With
+# SWARM (or --swarm) they are all stepped together in NumPy arrays instead
+# (see swarm.py) and there can be SWARM_MAXPART of them. That goes past
+# 100000, but a window that crowded grows a blob rather than a tree.
+SWARM = False
+SWARM_MAXPART = 200
+# with DLA (or --dla) the swarm's particles are DLA walkers instead: they
+# start on a circle just round the tree and jump wherever the tree is far
+# away, so it grows many times quicker (see dla_swarm.py). It turns on
+# SWARM as well.
+DLA = False
+# most frames drawn a second, however fast the simulation ticks
+FPS = 60
+# press p for ticks per second, free particles and tree size in the window
+# caption (see perf.py). Set PERF_LOG to a .csv or .jsonl file to start with
+# them on and have them written there every second.
+PERF_LOG = None
 # size to increase roots by (larger than particles)
 root_augment_size = 4
 # angle in radians to shift roots around ellipse
@@ -19,23 +50,49 @@ shift_angle = 0
 # width and height of the ellipse
 e_width = 70
 e_height = 30
+# an image file to bounce the particles off instead of the ellipse: it is
+# stretched to the window and its light pixels are solid (see boundary.py)
+OBSTACLE = None
+# the command line options when it is run, and the random seed from them
+args = None
+SEED = None
 # asks for window size as small, medium or large
-params = Brownian_tree_input2.input_variables(window_width,
-                                              window_height,
-                                              e_width,
-                                              e_height,
-                                              SIZE,
-                                              root_augment_size,
-                                              shift_angle,
-                                              )
-
-window_width = params[0]
-window_height = params[1]
-e_width = params[2]
-e_height = params[3]
-SIZE = params[4]
-root_augment_size = params[5]
-shift_angle = params[6]
+# (only when run; importing it, as benchmarks/suite.py does, keeps the
+# defaults and doesn't start the simulation). With --headless there is no
+# input box or window, the tree is grown and written out (see headless.py).
+if __name__ == "__main__":
+    args = headless.parse_args(
+        "Grow a Brownian tree from five roots around an ellipse.",
+        [("width", window_width, "window width in pixels"),
+         ("height", window_height, "window height in pixels"),
+         ("ellipse_width", e_width, "ellipse width in pixels"),
+         ("ellipse_height", e_height, "ellipse height in pixels"),
+         ("size", SIZE, "particle size in pixels"),
+         ("root_size", root_augment_size,
+          "how much bigger the roots are than the particles"),
+         ("shift_angle", shift_angle,
+          "radians to turn the roots around the ellipse")])
+    SEED = args.seed
+    DLA = DLA or args.dla
+    SWARM = SWARM or args.swarm or DLA
+    random.seed(SEED)
+    if args.headless:
+        params = args.params
+    else:
+        # the options are the input box's defaults. tkinter is only needed
+        # for this, so it isn't imported headless.
+        import Brownian_tree_input2
+        params = Brownian_tree_input2.input_variables(*args.params)
+
+    window_width = params[0]
+    window_height = params[1]
+    e_width = params[2]
+    e_height = params[3]
+    SIZE = params[4]
+    root_augment_size = params[5]
+    shift_angle = params[6]
+
+pygame.init()
 
 # needed for reposition of particles
 a = e_width/2
@@ -84,10 +141,70 @@ e_y5 = int(b*math.sin(angle5))
 # if they are tree they stop
 freeParticles = pygame.sprite.Group()
 tree = pygame.sprite.Group()
+# the free particles again, sorted into a grid so each one only has to
+# look at its neighbors to see if it has bumped into another one (see
+# particle_grid.py)
+free_grid = ParticleGrid(SIZE)
+# the tree again as a bitmap, so a particle can find out if it has hit the
+# tree by looking at the pixels under it instead of at every particle in
+# the tree (see tree_bitmap.py)
+tree_bitmap = TreeBitmap(WINDOWSIZE[0], WINDOWSIZE[1], MAXSPEED + SIZE)
+
+# where the particles bounce off the ellipse (or the OBSTACLE picture) and
+# which way they bounce, worked out once here instead of every tick (see
+# boundary.py). A particle bounces when its middle is inside the ellipse
+# less an internal fudge factor that changes with ellipse size, plus SIZE.
+if OBSTACLE is None:
+    boundary = ellipse_boundary(WINDOWSIZE[0], WINDOWSIZE[1], center, a, b,
+                                (e_width + e_height)/50, SIZE)
+else:
+    obstacle = pygame.transform.scale(pygame.image.load(OBSTACLE),
+                                      WINDOWSIZE)
+    boundary = image_boundary(obstacle)
+
+# the swarm bounces off the ellipse as well, the same way Particle.onEdge
+# does
+class OvalSwarm(Swarm):
+    def on_edge(self):
+        bounced = Swarm.on_edge(self)
+        half = self.size//2
+        x = self.x + half
+        y = self.y + half
+        inside = ~bounced & boundary.inside_many(x, y)
+        self.vx[inside], self.vy[inside] = boundary.reflect_many(
+            x[inside], y[inside], self.vx[inside], self.vy[inside])
+        return bounced | inside
+
+# DLA walkers keep their middles out of the ellipse themselves
+if DLA:
+    swarm = DLASwarm(WINDOWSIZE[0], WINDOWSIZE[1], SIZE, MAXSPEED,
+                     tree_bitmap, center, boundary, SEED)
+else:
+    swarm = OvalSwarm(WINDOWSIZE[0], WINDOWSIZE[1], SIZE, MAXSPEED,
+                      tree_bitmap, SEED)
  
 window = pygame.display.set_mode((WINDOWSIZE[0], WINDOWSIZE[1]))
 pygame.display.set_caption("Brownian Tree 5 Roots Around an Ellipse")
 screen = pygame.display.get_surface()
+
+def draw_ellipse(surface):
+    if OBSTACLE is not None:
+        surface.blit(obstacle, (0, 0))
+        return
+    pygame.draw.ellipse(surface,
+                        (112,128,144),
+                        [int(center[0] - (e_width/2)),
+                         int(center[1] - (e_height/2)),
+                         int(e_width),
+                         int(e_height)],
+                         3
+                        )
+
+# draws the swarm and the tree over the ellipse (see renderer.py); the
+# sprites draw themselves and only use it to flip the display
+background = pygame.Surface(WINDOWSIZE)
+draw_ellipse(background)
+renderer = Renderer(screen, tree_bitmap, COLOR, COLOR, background)
   
 class Particle(pygame.sprite.Sprite):
     def __init__(self, vector, location, surface):
@@ -97,18 +214,10 @@ class Particle(pygame.sprite.Sprite):
         self.accelerate(vector)
         self.add(freeParticles)
         self.rect = pygame.Rect(location[0], location[1], SIZE, SIZE)
+        free_grid.add(self)
         self.surface.fill(COLOR, self.rect)
  
     def onEdge(self):
-        dx = self.rect.centerx - center[0]
-        dy = self.rect.centery - center[1]
-        dist = math.hypot(dx, dy)
-        # distance of an ellipse from center
-        t = math.atan2(dy, dx)
-        # added an internal fudge factor that changes with ellipse size
-        e_dist = int(math.hypot(b*math.sin(t), a*math.cos(t))) \
-                 - (e_width + e_height)/50
-                    
         if self.rect.left <= 0:
             self.vector = (abs(self.vector[0]), self.vector[1])
         elif self.rect.top <= 0:
@@ -117,24 +226,20 @@ class Particle(pygame.sprite.Sprite):
             self.vector = (-abs(self.vector[0]), self.vector[1])
         elif self.rect.bottom >= WINDOWSIZE[1]:
             self.vector = (self.vector[0], -abs(self.vector[1]))
-        # bounce off ellipse, SIZE is the 'fudge factor'
-        # future, make angle of incidence == angle of reflection
-        elif dist < (e_dist + SIZE):
-            self.vector = (-self.vector[0],
-                           -self.vector[1])
+        # bounce off ellipse, angle of incidence == angle of reflection
+        elif boundary.inside(self.rect.centerx, self.rect.centery):
+            self.vector = boundary.reflect(self.rect.centerx,
+                                           self.rect.centery,
+                                           self.vector[0], self.vector[1])
  
     def update(self):
         if freeParticles in self.groups():
             self.surface.fill((0,0,0), self.rect)
-            self.remove(freeParticles)
-            if pygame.sprite.spritecollideany(self, freeParticles):
+            if free_grid.collideany(self):
                 self.accelerate((randint(-MAXSPEED, MAXSPEED), 
                                  randint(-MAXSPEED, MAXSPEED)))
-                self.add(freeParticles)
-            elif pygame.sprite.spritecollideany(self, tree):
+            elif tree_bitmap.hits(self.rect):
                 self.stop()
-            else:
-                self.add(freeParticles)
  
             self.onEdge()
  
@@ -142,85 +247,166 @@ class Particle(pygame.sprite.Sprite):
                 self.accelerate((randint(-MAXSPEED, MAXSPEED), 
                                  randint(-MAXSPEED, MAXSPEED)))
             self.rect.move_ip(self.vector[0], self.vector[1])
+            if tree not in self.groups():
+                free_grid.move(self)
         self.surface.fill(COLOR, self.rect)
  
     def stop(self):
         self.vector = (0,0)
         self.remove(freeParticles)
         self.add(tree)
+        tree_bitmap.add(self.rect)
+        free_grid.remove(self)
  
     def accelerate(self, vector):
         self.vector = vector
  
-NEW = USEREVENT + 1
-TICK = USEREVENT + 2
- 
-pygame.time.set_timer(NEW, 50)
-pygame.time.set_timer(TICK, TIMETICK)
+PERF = USEREVENT + 3
+# steps taken so far
+steps = 0
+
+# nothing is measured while these are None
+perf_stats = None
+perf_log = None
+caption = ""
+
+def toggle_perf():
+    global perf_stats, caption
+    if perf_stats is None:
+        caption = pygame.display.get_caption()[0]
+        perf_stats = perf.Stats()
+        if SWARM:
+            perf_stats.wrap(swarm, "step", counter="ticks", timer="update")
+            perf_stats.wrap(renderer, "draw", counter="frames", timer="draw")
+        else:
+            perf_stats.wrap(freeParticles, "update", counter="ticks", timer="update")
+        pygame.time.set_timer(PERF, 1000)
+    else:
+        pygame.time.set_timer(PERF, 0)
+        perf_stats.unwrap()
+        perf_stats = None
+        pygame.display.set_caption(caption)
+
+def show_perf():
+    if SWARM:
+        row = perf_stats.sample({"free": len(swarm),
+                                 "tree": len(tree) + swarm.stuck})
+    else:
+        row = perf_stats.sample({"free": len(freeParticles), "tree": len(tree)})
+    pygame.display.set_caption(caption + " | " + ", ".join(perf.describe(row)))
+    if perf_log is not None:
+        perf_log.write(row)
  
+# new free particles, every SPAWN_EVERY steps (every step for DLA walkers)
+def spawn():
+    if SWARM and DLA:
+        swarm.launch(SWARM_MAXPART - len(swarm))
+    elif SWARM:
+        # all the particles the swarm is short of at once, in the same
+        # four corners as below
+        swarm.spawn_corners(SWARM_MAXPART - len(swarm), tenth[0], tenth[1])
+    elif len(freeParticles) < MAXPART:
+        # make the particles appear away from the center
+        # give four corners for Particles to appear
+        rand = randint(1, 4)
+        
+        if rand == 1:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                      randint(-MAXSPEED,MAXSPEED)),
+                     (randint(0, tenth[0]), randint(0, tenth[1])), 
+                     screen)
+        elif rand == 2:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                     randint(-MAXSPEED,MAXSPEED)),
+                     (randint(WINDOWSIZE[0] - tenth[0], WINDOWSIZE[0]),
+                      randint(WINDOWSIZE[1] - tenth[1], WINDOWSIZE[1])), 
+                      screen)
+        elif rand == 3:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                     randint(-MAXSPEED,MAXSPEED)),
+                     (randint(WINDOWSIZE[0] - tenth[0], WINDOWSIZE[0]),
+                      randint(0, tenth[1])), 
+                      screen)
+        elif rand == 4:
+            Particle((randint(-MAXSPEED,MAXSPEED),
+                     randint(-MAXSPEED,MAXSPEED)),
+                     (randint(0, tenth[0]),
+                      randint(WINDOWSIZE[1] - tenth[1], WINDOWSIZE[1])), 
+                      screen)
+
+# one step of the simulation: new particles when it's time for them, then
+# every free particle moves once
+def step():
+    global steps
+    if DLA or steps % SPAWN_EVERY == 0:
+        spawn()
+    if SWARM:
+        swarm.step()
+    else:
+        freeParticles.update()
+    steps += 1
+
+# the steps between two frames: STEPS_PER_FRAME of them, or as many as fit
+# in STEP_BUDGET milliseconds
+def run_steps():
+    if STEPS_PER_FRAME:
+        for i in range(STEPS_PER_FRAME):
+            step()
+    else:
+        deadline = time.perf_counter() + STEP_BUDGET/1000.0
+        while time.perf_counter() < deadline:
+            step()
+
 def input(events):
     for event in events:
         if event.type == QUIT:
             pygame.quit(), sys.exit(0)
-        elif event.type == NEW and (len(freeParticles) < MAXPART):
-            # make the particles appear away from the center
-            # give four corners for Particles to appear
-            rand = randint(1, 4)
-            
-            if rand == 1:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                          randint(-MAXSPEED,MAXSPEED)),
-                         (randint(0, tenth[0]), randint(0, tenth[1])), 
-                         screen)
-            elif rand == 2:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                         randint(-MAXSPEED,MAXSPEED)),
-                         (randint(WINDOWSIZE[0] - tenth[0], WINDOWSIZE[0]),
-                          randint(WINDOWSIZE[1] - tenth[1], WINDOWSIZE[1])), 
-                          screen)
-            elif rand == 3:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                         randint(-MAXSPEED,MAXSPEED)),
-                         (randint(WINDOWSIZE[0] - tenth[0], WINDOWSIZE[0]),
-                          randint(0, tenth[1])), 
-                          screen)
-            elif rand == 4:
-                Particle((randint(-MAXSPEED,MAXSPEED),
-                         randint(-MAXSPEED,MAXSPEED)),
-                         (randint(0, tenth[0]),
-                          randint(WINDOWSIZE[1] - tenth[1], WINDOWSIZE[1])), 
-                          screen)
-                
-        elif event.type == TICK:
-            freeParticles.update()
+        elif event.type == KEYDOWN and event.key == K_p:
+            toggle_perf()
+        elif event.type == PERF and perf_stats is not None:
+            show_perf()
 
         
 
-# place 5 roots around a oval
-SIZE = SIZE + root_augment_size
+if __name__ == "__main__":
+    if PERF_LOG is not None:
+        perf_log = perf.PerfLog(PERF_LOG)
+        toggle_perf()
 
-root1 = Particle((0, 0), (center[0] + e_x1, center[1] + e_y1), screen)
-root1.stop()
-root2 = Particle((0, 0), (center[0] + e_x2, center[1] + e_y2), screen)
-root2.stop()
-root3 = Particle((0, 0), (center[0] + e_x3, center[1] + e_y3), screen)
-root3.stop()
-root4 = Particle((0, 0), (center[0] + e_x4, center[1] + e_y4 - SIZE), screen)
-root4.stop()
-root5 = Particle((0, 0), (center[0] + e_x5, center[1] + e_y5 - SIZE), screen)
-root5.stop()
+    # place 5 roots around a oval
+    SIZE = SIZE + root_augment_size
 
-SIZE = SIZE - root_augment_size
+    root1 = Particle((0, 0), (center[0] + e_x1, center[1] + e_y1), screen)
+    root1.stop()
+    root2 = Particle((0, 0), (center[0] + e_x2, center[1] + e_y2), screen)
+    root2.stop()
+    root3 = Particle((0, 0), (center[0] + e_x3, center[1] + e_y3), screen)
+    root3.stop()
+    root4 = Particle((0, 0), (center[0] + e_x4, center[1] + e_y4 - SIZE), screen)
+    root4.stop()
+    root5 = Particle((0, 0), (center[0] + e_x5, center[1] + e_y5 - SIZE), screen)
+    root5.stop()
 
-while True:
-    input(pygame.event.get())
+    SIZE = SIZE - root_augment_size
 
-    pygame.draw.ellipse(screen,
-                        (112,128,144),
-                        [int(center[0] - (e_width/2)),
-                         int(center[1] - (e_height/2)),
-                         int(e_width),
-                         int(e_height)],
-                         3
-                        )
-    pygame.display.flip()
+    if args.headless:
+        steps, seconds = headless.run(step, lambda: len(tree) + swarm.stuck,
+                                      args.particles, args.seconds)
+        headless.save(args.output, renderer.tree_surface(), tree_bitmap,
+                      steps, seconds)
+        print("%d particles in %d steps, %.1f s, written to %s.png and %s.npz"
+              % (len(tree) + swarm.stuck, steps, seconds, args.output,
+                 args.output))
+        sys.exit(0)
+
+    clock = pygame.time.Clock()
+    while True:
+        input(pygame.event.get())
+        run_steps()
+        if SWARM:
+            renderer.draw(swarm)
+        else:
+            draw_ellipse(screen)
+            renderer.flip()
+        # no more than FPS frames a second
+        clock.tick(FPS)
@@ -0,0 +1,42 @@
+"""
+Accepted spheres per second for different batch sizes in
+GrowthEngine.attempt_batch. Every run grows the same seeded tree from its
+roots up to the same number of spheres, so only the batch size changes.
+
+    python benchmarks/batch_size.py --spheres 20000 --batches 1 4 16 64 256
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from growth_engine import GrowthEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spheres", type=int, default=10000,
+                        help="grow each tree to this many spheres (default 10000)")
+    parser.add_argument("--batches", type=int, nargs="+",
+                        default=[1, 4, 16, 64, 256, 1024],
+                        help="batch sizes to try")
+    parser.add_argument("--size", type=int, default=5, help="sphere size")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    args = parser.parse_args()
+
+    print("%8s %10s %10s %12s %12s" % ("batch", "spheres", "attempts",
+                                       "seconds", "spheres/s"))
+    for batch_size in args.batches:
+        # Five root cerebellum, so there are plenty of roots to go around.
+        engine = GrowthEngine(sphere_size=args.size, simulation=3,
+                              four_roots=False, seed=args.seed)
+        start = time.perf_counter()
+        added = engine.run(max_spheres=args.spheres, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        print("%8d %10d %10d %12.2f %12.0f" % (batch_size, added, engine.attempts,
+                                               elapsed, added/elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Frame time with N spheres in the scene, drawn the original way (a model,
+material and pair of lights per sphere, sphere_batch.load_single_sphere), with
+sphere_batch.SphereBatch, and with SphereBatch after every sphere has burned
+out and been merged into its chunk. Renders into an offscreen buffer, so it
+runs without a display.
+
+    python benchmarks/render_frame_time.py --spheres 10000 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+from panda3d.core import loadPrcFileData
+
+loadPrcFileData("", "window-type offscreen\n"
+                    "win-size 800 600\n"
+                    "audio-library-name null\n"
+                    "sync-video false\n")
+
+from direct.showbase.ShowBase import ShowBase
+from panda3d.core import AmbientLight, DirectionalLight, LVector3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sphere_batch import SphereBatch, load_single_sphere
+
+SPHERE_SIZE = 5
+COLORS = [(1, 0, 0, 1), (0, 0.5, 0, 1), (0, 0, 1, 1), (1, 1, 0, 1), (1, 1, 1, 1)]
+
+
+# n points on a cube shaped grid around (0, 0, 0), spaced about as far apart
+# as the spheres in a tree, so they all fit in front of the camera.
+def grid_positions(n):
+    side = int(round(n ** (1.0/3))) + 1
+    spacing = 4
+    offset = (side - 1)*spacing/2.0
+    positions = []
+    for i in range(side):
+        for j in range(side):
+            for k in range(side):
+                if len(positions) == n:
+                    return positions
+                positions.append((i*spacing - offset,
+                                  j*spacing - offset,
+                                  k*spacing - offset))
+    return positions
+
+
+def time_frames(base, frames):
+    # A few frames first so everything is loaded onto the card.
+    for i in range(3):
+        base.graphicsEngine.renderFrame()
+    start = time.perf_counter()
+    for i in range(frames):
+        base.graphicsEngine.renderFrame()
+    return (time.perf_counter() - start)/frames*1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spheres", type=int, nargs="+", default=[10000, 50000],
+                        help="numbers of spheres to try (default 10000 50000)")
+    parser.add_argument("--frames", type=int, default=20,
+                        help="frames to average over (default 20)")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="spheres per RigidBodyCombiner (default 256)")
+    parser.add_argument("--chunk-size", type=float, default=50,
+                        help="side of the merged chunks (default 50)")
+    args = parser.parse_args()
+
+    base = ShowBase()
+    base.disableMouse()
+    base.camera.setPos(0, -300, 0)
+    ambientLight = AmbientLight("ambientLight")
+    ambientLight.setColor((0.3, 0.4, 0.5, 1))
+    directionalLight = DirectionalLight("directionalLight")
+    directionalLight.setDirection(LVector3(0, 5, -5))
+    directionalLight.setColor((0.9, 0.9, 0.9, 1))
+
+    # The ball model main.py uses, or the sphere that comes with Panda3D.
+    model = "ball"
+    try:
+        base.loader.loadModel(model)
+    except IOError:
+        model = "models/misc/sphere"
+
+    print("%10s %14s %14s %14s" % ("spheres", "original ms", "batched ms",
+                                   "chunked ms"))
+    for n in args.spheres:
+        positions = grid_positions(n)
+
+        parent = base.render.attachNewNode("original")
+        for i, position in enumerate(positions):
+            load_single_sphere(base.loader, parent, position, SPHERE_SIZE,
+                               COLORS[i % 5], directionalLight, ambientLight,
+                               model)
+        original = time_frames(base, args.frames)
+        parent.removeNode()
+
+        parent = base.render.attachNewNode("batched")
+        spheres = SphereBatch(base.loader, parent, SPHERE_SIZE,
+                              directionalLight, ambientLight, model,
+                              args.batch_size, args.chunk_size)
+        for i, position in enumerate(positions):
+            spheres.add(position, COLORS[i % 5], i)
+        spheres.collect()
+        batched = time_frames(base, args.frames)
+
+        for i in range(n):
+            spheres.retire(i)
+        while spheres.merge(max_chunks=64):
+            pass
+        chunked = time_frames(base, args.frames)
+        parent.removeNode()
+
+        print("%10d %14.1f %14.1f %14.1f" % (n, original, batched, chunked))
+
+
+if __name__ == "__main__":
+    main()
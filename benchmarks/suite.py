@@ -0,0 +1,362 @@
+"""
+Seeded, headless benchmarks of the hot paths, written to a JSON file so two
+runs (before and after a change) can be compared:
+
+    growth     growth attempts and accepted spheres per second (what
+               main.add_sphere does, without drawing) on trees of 1k, 10k and
+               100k spheres, one try at a time and in batches of 64
+    startup    GrowthEngine start up time (what main.calculate does) per
+               sphere size, working the vectors out, from the disk cache and
+               from memory
+    particles  ticks per second in both 2D scripts for several MAXPART and
+               tree sizes, with sprites (Particle.update) and with the
+               NumPy swarm (swarm.py), which goes up to many more particles,
+               and the time the swarm's Renderer takes to draw a frame
+    render     time per sphere to load it (main.load_sphere, the original way
+               and batched) and to draw it each frame
+
+    python benchmarks/suite.py -o before.json
+    python benchmarks/suite.py -o after.json
+    python benchmarks/suite.py --compare before.json after.json
+
+--only picks some of the benchmarks and --quick uses smaller sizes. The 2D
+scripts run on SDL's dummy video driver and the 3D ones in an offscreen
+buffer, so no display is needed. Trees for the growth benchmark are grown
+once and kept in benchmarks/cache as checkpoints (the 100k one takes a few
+minutes the first time); they are seeded, so they are the same tree every
+time. Delete benchmarks/cache after changing how the trees grow.
+"""
+from importlib import util
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+CACHE_DIR = os.path.join(HERE, "cache")
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import vector_lattice
+from checkpoint import save_checkpoint, load_checkpoint
+from growth_engine import GrowthEngine
+
+SECTIONS = ["growth", "startup", "particles", "render"]
+SCRIPTS = ["Brownian Tree Two Point.py", "Brownian tree oval with 5 roots.py"]
+
+
+# A five root cerebellum tree of n spheres, from the cache or grown (and
+# cached) if it isn't there yet.
+def seeded_tree(n, seed):
+    path = os.path.join(CACHE_DIR, "tree_%d_%d" % (n, seed))
+    if os.path.exists(path):
+        return load_checkpoint(path)
+    engine = GrowthEngine(simulation=3, four_roots=False, seed=seed)
+    engine.run(max_spheres=n, batch_size=64)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    save_checkpoint(engine, path)
+    return engine
+
+
+def bench_growth(sizes, attempts, seed):
+    rows = []
+    for n in sizes:
+        for batch_size in (1, 64):
+            engine = seeded_tree(n, seed)
+            roots = range(engine.roots)
+            start_spheres = len(engine.sphere_list)
+            start_attempts = engine.attempts
+            start = time.perf_counter()
+            while engine.attempts - start_attempts < attempts and not engine.finished():
+                for root in roots:
+                    if batch_size > 1:
+                        engine.attempt_batch(root, batch_size)
+                    else:
+                        engine.attempt(root)
+            elapsed = time.perf_counter() - start
+            made = engine.attempts - start_attempts
+            accepted = len(engine.sphere_list) - start_spheres
+            rows.append({"case": "spheres=%d batch=%d" % (n, batch_size),
+                         "attempts_per_s": made/elapsed,
+                         "accepts_per_s": accepted/elapsed,
+                         "accept_rate": accepted/max(made, 1)})
+            print("  %-24s %10.0f attempts/s %10.0f accepts/s"
+                  % (rows[-1]["case"], rows[-1]["attempts_per_s"],
+                     rows[-1]["accepts_per_s"]))
+    return rows
+
+
+def bench_startup(sizes):
+    rows = []
+    for sphere_size in sizes:
+        start = time.perf_counter()
+        vector_lattice.calculate_vectors(sphere_size/1.5)
+        calculated = time.perf_counter() - start
+
+        # Makes sure the disk cache is there, then times a start up from it.
+        vector_lattice.possible_vectors(sphere_size)
+        vector_lattice._vectors.pop(sphere_size, None)
+        start = time.perf_counter()
+        GrowthEngine(sphere_size=sphere_size, seed=0)
+        cached = time.perf_counter() - start
+
+        start = time.perf_counter()
+        GrowthEngine(sphere_size=sphere_size, seed=0)
+        in_memory = time.perf_counter() - start
+
+        rows.append({"case": "size=%d" % sphere_size,
+                     "calculate_ms": calculated*1000,
+                     "disk_cache_ms": cached*1000,
+                     "memory_ms": in_memory*1000})
+        print("  %-24s %8.2f ms worked out %8.2f ms disk %8.2f ms memory"
+              % (rows[-1]["case"], calculated*1000, cached*1000, in_memory*1000))
+    return rows
+
+
+# Imports one of the 2D scripts (their names have spaces, so it has to be by
+# path). Importing doesn't open the input box or start the simulation.
+def load_script(name):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    spec = util.spec_from_file_location(
+        os.path.splitext(name)[0].replace(" ", "_"), os.path.join(ROOT, name))
+    module = util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# A random position somewhere in the middle half of the window, where the
+# tree would be.
+def middle(width, height):
+    return (random.randint(width//4, 3*width//4),
+            random.randint(height//4, 3*height//4))
+
+
+# Empties the script's window, tree and free particles and grows a new tree
+# of tree_size particles.
+def reset_script(module, tree_size, seed):
+    width, height = module.screen.get_size()
+    random.seed(seed)
+    module.freeParticles.empty()
+    module.free_grid.clear()
+    module.tree.empty()
+    module.tree_bitmap.clear()
+    module.swarm.clear()
+    module.swarm.rng = np.random.default_rng(seed)
+    module.screen.fill((0, 0, 0))
+    for i in range(tree_size):
+        module.Particle((0, 0), middle(width, height), module.screen).stop()
+
+
+# Average milliseconds the script's Renderer takes to draw a frame, with
+# a step between frames.
+def time_renderer(module, frames):
+    renderer = module.renderer
+    renderer.shown = None
+    renderer.draw(module.swarm)
+    drawing = 0.0
+    for i in range(frames):
+        module.step()
+        start = time.perf_counter()
+        renderer.draw(module.swarm)
+        drawing += time.perf_counter() - start
+    return drawing*1000/frames
+
+
+def bench_particles(maxparts, swarm_sizes, trees, ticks, seed):
+    rows = []
+    for name in SCRIPTS:
+        module = load_script(name)
+        width, height = module.screen.get_size()
+        cases = [(False, maxpart) for maxpart in maxparts]
+        cases += [(True, maxpart) for maxpart in swarm_sizes]
+        for swarm, maxpart in cases:
+            for tree_size in trees:
+                reset_script(module, tree_size, seed)
+                module.SWARM = swarm
+                module.MAXPART = module.SWARM_MAXPART = maxpart
+                # New particles every step, if there's room, to keep the
+                # number of free particles up: one a step for the sprites,
+                # as many as are missing for the swarm.
+                module.SPAWN_EVERY = 1
+                speed = module.MAXSPEED
+                if swarm:
+                    module.swarm.spawn(
+                        module.swarm.rng.integers(0, width + 1, size=maxpart),
+                        module.swarm.rng.integers(0, height + 1, size=maxpart))
+                else:
+                    for i in range(maxpart):
+                        module.Particle((random.randint(-speed, speed),
+                                         random.randint(-speed, speed)),
+                                        (random.randint(0, width),
+                                         random.randint(0, height)),
+                                        module.screen)
+
+                updated = 0
+                start = time.perf_counter()
+                for i in range(ticks):
+                    if swarm:
+                        updated += len(module.swarm)
+                    else:
+                        updated += len(module.freeParticles)
+                    module.step()
+                elapsed = time.perf_counter() - start
+                row = {"case": "%s maxpart=%d tree=%d%s"
+                       % (name[:-3], maxpart, tree_size,
+                          " swarm" if swarm else ""),
+                       "ticks_per_s": ticks/elapsed,
+                       "particle_updates_per_s": updated/elapsed,
+                       "final_tree": len(module.tree) + module.swarm.stuck}
+                if swarm:
+                    row["frame_ms"] = time_renderer(module, 20)
+                rows.append(row)
+                print("  %-58s %8.0f ticks/s %10.0f updates/s%s"
+                      % (row["case"], row["ticks_per_s"],
+                         row["particle_updates_per_s"],
+                         " %6.2f ms/frame" % row["frame_ms"] if swarm else ""))
+    return rows
+
+
+def bench_render(counts, frames):
+    # Sets up the offscreen buffer, so only imported when needed.
+    from render_frame_time import grid_positions, time_frames
+    from direct.showbase.ShowBase import ShowBase
+    from panda3d.core import AmbientLight, DirectionalLight, LVector3, VBase4
+    from sphere_batch import SphereBatch, load_single_sphere
+
+    base = ShowBase()
+    base.disableMouse()
+    base.camera.setPos(0, -300, 0)
+    ambientLight = AmbientLight("ambientLight")
+    directionalLight = DirectionalLight("directionalLight")
+    directionalLight.setDirection(LVector3(0, 5, -5))
+    model = "ball"
+    try:
+        base.loader.loadModel(model)
+    except IOError:
+        model = "models/misc/sphere"
+    color = VBase4(0.4, 0.4, 0.4, 1)
+
+    rows = []
+    for n in counts:
+        positions = grid_positions(n)
+        empty = time_frames(base, frames)
+
+        parent = base.render.attachNewNode("original")
+        start = time.perf_counter()
+        for position in positions:
+            load_single_sphere(base.loader, parent, position, 5, color,
+                               directionalLight, ambientLight, model)
+        loaded = time.perf_counter() - start
+        frame = time_frames(base, frames)
+        parent.removeNode()
+        rows.append({"case": "spheres=%d original" % n,
+                     "load_us_per_sphere": loaded/n*1e6,
+                     "frame_us_per_sphere": (frame - empty)*1000/n})
+
+        parent = base.render.attachNewNode("batched")
+        start = time.perf_counter()
+        spheres = SphereBatch(base.loader, parent, 5, directionalLight,
+                              ambientLight, model)
+        for i, position in enumerate(positions):
+            spheres.add(position, color, i)
+        spheres.collect()
+        loaded = time.perf_counter() - start
+        frame = time_frames(base, frames)
+        parent.removeNode()
+        rows.append({"case": "spheres=%d batched" % n,
+                     "load_us_per_sphere": loaded/n*1e6,
+                     "frame_us_per_sphere": (frame - empty)*1000/n})
+
+        for row in rows[-2:]:
+            print("  %-24s %8.1f us/sphere to load %8.2f us/sphere per frame"
+                  % (row["case"], row["load_us_per_sphere"],
+                     row["frame_us_per_sphere"]))
+    base.destroy()
+    return rows
+
+
+def run(sections, quick, seed):
+    results = {"meta": {"seed": seed,
+                        "quick": quick,
+                        "python": platform.python_version(),
+                        "numpy": np.__version__,
+                        "platform": platform.platform(),
+                        "processor": platform.processor(),
+                        "date": time.strftime("%Y-%m-%d %H:%M:%S")}}
+    for section in sections:
+        print(section)
+        start = time.perf_counter()
+        if section == "growth":
+            sizes = [1000, 10000] if quick else [1000, 10000, 100000]
+            rows = bench_growth(sizes, 5000 if quick else 20000, seed)
+        elif section == "startup":
+            rows = bench_startup([3, 5, 8] if quick else [3, 5, 8, 12, 20, 30])
+        elif section == "particles":
+            rows = bench_particles([50, 200] if quick else [50, 200, 1000],
+                                   [200, 10000] if quick else [200, 10000, 100000],
+                                   [0, 500] if quick else [0, 500, 2000],
+                                   200 if quick else 1000, seed)
+        elif section == "render":
+            rows = bench_render([1000] if quick else [1000, 10000],
+                                5 if quick else 20)
+        results[section] = rows
+        print("  (%.1f s)" % (time.perf_counter() - start))
+    return results
+
+
+# Prints every number in new next to the same one in old.
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    for section in SECTIONS:
+        if section not in old or section not in new:
+            continue
+        print(section)
+        before = dict((row["case"], row) for row in old[section])
+        for row in new[section]:
+            previous = before.get(row["case"])
+            if previous is None:
+                continue
+            for key, value in row.items():
+                if key == "case" or key not in previous:
+                    continue
+                if previous[key]:
+                    change = "%6.2fx" % (value/previous[key])
+                else:
+                    change = ""
+                print("  %-52s %-24s %12.2f -> %12.2f %s"
+                      % (row["case"], key, previous[key], value, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", choices=SECTIONS, nargs="+", default=SECTIONS,
+                        help="benchmarks to run (default all)")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller sizes, for a fast check")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default 1)")
+    parser.add_argument("-o", "--output", default="benchmarks.json",
+                        help="where to write the results (default benchmarks.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = run(args.only, args.quick, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("written to %s" % args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Something solid in the window of a 2D script for the free particles to bounce
+off, worked out once at the start: which pixels are inside it and, for every
+one of those, which way its surface faces.
+
+The oval script used to work out for every particle on every tick how far it
+was from the middle of the ellipse and how far the ellipse reached in that
+direction (hypot, atan2 and more trig), and then sent the particle straight
+back the way it came. With a Boundary that is two lookups in arrays, and the
+particle bounces off the surface the way light bounces off a mirror,
+
+    v' = v - 2 (v.n) n
+
+where n is the surface normal at the pixel it is on. Particles already on
+their way out are left alone, so none get stuck going back and forth inside.
+
+The solid part is a bool array indexed [x, y], like pygame.surfarray, so it
+can come from the ellipse (ellipse_boundary) or from any picture of an
+obstacle (image_boundary). The normals are the direction the solid part
+thins out fastest: the gradient of the mask blurred a little, or blurred more
+deep inside where a little blur doesn't reach the surface.
+"""
+import numpy as np
+
+
+# Every value replaced by the mean of the (2r+1) x (2r+1) square around it,
+# the edges repeated outwards.
+def _box_blur(field, r):
+    for axis in (0, 1):
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (r + 1, r)
+        total = np.cumsum(np.pad(field, pad, mode="edge"), axis=axis)
+        n = field.shape[axis]
+        field = (np.take(total, np.arange(2*r + 1, 2*r + 1 + n), axis=axis)
+                 - np.take(total, np.arange(n), axis=axis))/(2*r + 1)
+    return field
+
+
+class Boundary:
+    """
+    solid - bool array the size of the window, indexed [x, y], True where
+            particles bounce
+    """
+
+    def __init__(self, solid):
+        self.solid = np.asarray(solid, dtype=bool)
+        self.width, self.height = self.solid.shape
+        self.nx, self.ny = self._normals()
+        # The same as lists, for the sprites: indexing a list with one
+        # pixel is quicker than indexing an array.
+        self._solid = self.solid.tolist()
+        self._nx = self.nx.tolist()
+        self._ny = self.ny.tolist()
+
+    # Unit normals pointing out of the solid part, for every pixel inside it
+    # (0, 0 outside it, and wherever there is no way out that is better
+    # than another).
+    def _normals(self):
+        nx = np.zeros(self.solid.shape)
+        ny = np.zeros(self.solid.shape)
+        todo = self.solid.copy()
+        field = self.solid.astype(float)
+        r = 2
+        while todo.any() and r < 2*max(self.solid.shape):
+            # Blurred twice, for a smooth slope across the edge.
+            smooth = _box_blur(_box_blur(field, r), r)
+            gx, gy = np.gradient(smooth)
+            length = np.hypot(gx, gy)
+            found = todo & (length > 1e-6)
+            nx[found] = -gx[found]/length[found]
+            ny[found] = -gy[found]/length[found]
+            todo &= ~found
+            r *= 2
+        return nx, ny
+
+    # Pixels off the window count as the nearest one on it.
+    def _index_many(self, x, y):
+        return (np.clip(x, 0, self.width - 1), np.clip(y, 0, self.height - 1))
+
+    # True if the pixel at x, y is inside the solid part.
+    def inside(self, x, y):
+        x = min(max(x, 0), self.width - 1)
+        y = min(max(y, 0), self.height - 1)
+        return self._solid[x][y]
+
+    # inside() for arrays of pixels.
+    def inside_many(self, x, y):
+        return self.solid[self._index_many(x, y)]
+
+    # The speed vx, vy of a particle at x, y after bouncing off the surface.
+    # A particle with no way out marked turns straight back.
+    def reflect(self, x, y, vx, vy):
+        x = min(max(x, 0), self.width - 1)
+        y = min(max(y, 0), self.height - 1)
+        nx, ny = self._nx[x][y], self._ny[x][y]
+        if nx == 0 and ny == 0:
+            return (-vx, -vy)
+        dot = vx*nx + vy*ny
+        if dot >= 0:
+            return (vx, vy)
+        return (int(round(vx - 2*dot*nx)), int(round(vy - 2*dot*ny)))
+
+    # reflect() for arrays of particles. Returns the new vx and vy.
+    def reflect_many(self, x, y, vx, vy):
+        i = self._index_many(x, y)
+        nx, ny = self.nx[i], self.ny[i]
+        dot = vx*nx + vy*ny
+        into = dot < 0
+        new_vx = np.where(into, np.rint(vx - 2*dot*nx), vx)
+        new_vy = np.where(into, np.rint(vy - 2*dot*ny), vy)
+        lost = (nx == 0) & (ny == 0)
+        new_vx[lost] = -vx[lost]
+        new_vy[lost] = -vy[lost]
+        return new_vx.astype(vx.dtype), new_vy.astype(vy.dtype)
+
+
+# The ellipse of the oval script, width x height window: the pixels a
+# particle's middle bounces off when it is inside the a by b (half width and
+# half height) ellipse around center, brought in by the script's fudge and
+# pushed out by pad.
+def ellipse_boundary(width, height, center, a, b, fudge, pad):
+    x, y = np.meshgrid(np.arange(width), np.arange(height), indexing="ij")
+    dx = x - center[0]
+    dy = y - center[1]
+    t = np.arctan2(dy, dx)
+    reach = np.hypot(b*np.sin(t), a*np.cos(t)).astype(int) - fudge
+    return Boundary(np.hypot(dx, dy) < reach + pad)
+
+
+# An obstacle drawn in a picture (a pygame surface the size of the window):
+# every pixel lighter than mid grey is solid.
+def image_boundary(surface):
+    import pygame
+    pixels = pygame.surfarray.array3d(surface).astype(np.int32)
+    return Boundary(pixels.sum(axis=2) > 3*127)
@@ -0,0 +1,197 @@
+"""
+Checkpoints for long 3D Brownian tree runs, so a big tree isn't lost when the
+program dies or the window is closed.
+
+A checkpoint is a directory holding a file CURRENT and the directory it
+names, state-N for the Nth save there, of plain .npy arrays plus a small
+meta.json:
+
+    positions.npy          float64 (spheres, 3)  every sphere, in id order
+    roots.npy              int8    (spheres,)    the root each one grew from
+    frontier_ids.npy       int64   (n,)          every root's frontier, in slot
+    frontier_children.npy  int8    (n,)          order, one after another
+    frontier_offsets.npy   int64   (roots + 1,)  where each root's part starts
+    colors.npy             float64 (roots, 4)    root colors
+    crowding.npy           uint64  (spheres,)    every sphere's crowding bits
+                                                 (see GrowthEngine.crowding);
+                                                 uint8 (spheres, w), w bytes
+                                                 each, lowest first, when
+                                                 they don't fit in 64 bits
+    meta.json                                    parameters, attempt count and
+                                                 both random number generators
+
+The arrays are fixed width and are loaded memory mapped, so even a checkpoint
+of a million spheres loads in well under a second. The frontiers are kept in
+slot order and the spatial hash is rebuilt in id order, so a resumed engine
+makes exactly the same choices the original would have made. A checkpoint
+from before crowding.npy was written has the crowding bits worked out again
+when it is loaded, which takes longer but comes to the same thing.
+
+A save writes a whole new state-N first and then points CURRENT at it with
+os.replace(), which swaps the file in one step, so whenever the program dies
+CURRENT names a complete checkpoint, the new one or the one before it. The
+one before is only deleted after that. A checkpoint written before CURRENT
+was (the arrays right in the directory) still loads, and is cleared out the
+next time a checkpoint is saved there.
+"""
+import gc
+import json
+import os
+import shutil
+
+import numpy as np
+
+from frontier import Frontier
+from growth_engine import GrowthEngine
+
+VERSION = 1
+
+# The files of one checkpoint's state.
+FILES = ["positions.npy", "roots.npy", "frontier_ids.npy",
+         "frontier_children.npy", "frontier_offsets.npy", "colors.npy",
+         "crowding.npy", "meta.json"]
+
+
+# The name of the state CURRENT points at in the checkpoint at path, or None.
+def current_state(path):
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(engine, path):
+    os.makedirs(path, exist_ok=True)
+    current = current_state(path)
+    number = 0 if current is None else int(current.split("-")[1]) + 1
+    name = "state-%d" % number
+    temp = os.path.join(path, name + ".tmp")
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+
+    n = len(engine.sphere_list)
+    frontier_ids = [sphere for frontier in engine.frontiers for sphere in frontier.ids]
+    frontier_children = [count for frontier in engine.frontiers
+                         for count in frontier.children]
+    frontier_offsets = np.cumsum([0] + [len(frontier) for frontier in engine.frontiers])
+
+    np.save(os.path.join(temp, "positions.npy"), engine.positions[:n])
+    np.save(os.path.join(temp, "roots.npy"),
+            np.array(engine.sphere_roots, dtype=np.int8))
+    np.save(os.path.join(temp, "frontier_ids.npy"),
+            np.array(frontier_ids, dtype=np.int64))
+    np.save(os.path.join(temp, "frontier_children.npy"),
+            np.array(frontier_children, dtype=np.int8))
+    np.save(os.path.join(temp, "frontier_offsets.npy"),
+            frontier_offsets.astype(np.int64))
+    np.save(os.path.join(temp, "colors.npy"),
+            np.array(engine.colors, dtype=np.float64).reshape(-1, 4))
+    width = (int(engine.radius) + engine.extra_distance + 7)//8
+    if width <= 8:
+        crowding = np.array(engine.crowding, dtype=np.uint64)
+    else:
+        crowding = b"".join(bits.to_bytes(width, "little")
+                            for bits in engine.crowding)
+        crowding = np.frombuffer(crowding, dtype=np.uint8).reshape(n, width)
+    np.save(os.path.join(temp, "crowding.npy"), crowding)
+
+    version, state, gauss = engine.rng.getstate()
+    meta = {"version": VERSION,
+            "sphere_size": engine.SPHERE_SIZE,
+            "simulation": engine.simulation,
+            "dist_btw": engine.DIST_BTW,
+            "four_roots": bool(engine.four_roots),
+            "color_scheme": engine.color_scheme,
+            "attempts": engine.attempts,
+            "rng": [version, list(state), gauss],
+            "np_rng": engine.np_rng.bit_generator.state}
+    with open(os.path.join(temp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    os.rename(temp, os.path.join(path, name))
+    # Swap the new checkpoint in for the old one.
+    pointer = os.path.join(path, "CURRENT.tmp")
+    with open(pointer, "w") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(path, "CURRENT"))
+
+    # Then the old one, leftovers of saves that died half way and the files
+    # of a checkpoint from before CURRENT can go.
+    for entry in os.listdir(path):
+        if entry == name:
+            continue
+        full = os.path.join(path, entry)
+        if entry.startswith("state-"):
+            shutil.rmtree(full, ignore_errors=True)
+        elif entry in FILES:
+            os.remove(full)
+
+
+def load_checkpoint(path):
+    # Turning the garbage collector off while millions of tuples are made
+    # about halves the time it takes; none of them can be garbage yet.
+    enabled = gc.isenabled()
+    gc.disable()
+    current = current_state(path)
+    try:
+        return _load(path if current is None else os.path.join(path, current))
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _load(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["version"] != VERSION:
+        raise ValueError("%s is a version %s checkpoint, expected version %d"
+                         % (path, meta["version"], VERSION))
+
+    def load(name):
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+    engine = GrowthEngine(sphere_size=meta["sphere_size"],
+                          simulation=meta["simulation"],
+                          dist_btw=meta["dist_btw"],
+                          four_roots=meta["four_roots"],
+                          color_scheme=meta["color_scheme"],
+                          plant=False)
+
+    positions = load("positions")
+    n = len(positions)
+    engine.positions = np.zeros((max(1024, 2*n), 3))
+    engine.positions[:n] = positions
+    engine.sphere_list = list(zip(*engine.positions[:n].T.tolist()))
+    engine.sphere_roots = load("roots").tolist()
+    engine.sphere_index.insert_array(engine.positions[:n])
+    engine.colors = list(map(tuple, load("colors").tolist()))
+    if os.path.exists(os.path.join(path, "crowding.npy")):
+        crowding = load("crowding")
+        if crowding.ndim == 1:
+            engine.crowding = crowding.tolist()
+        else:
+            # Too wide for a uint64; one sphere at a time.
+            width = crowding.shape[1]
+            data = np.asarray(crowding).tobytes()
+            engine.crowding = [int.from_bytes(data[i:i + width], "little")
+                               for i in range(0, len(data), width)]
+    else:
+        engine.rebuild_crowding()
+
+    ids = load("frontier_ids").tolist()
+    children = load("frontier_children").tolist()
+    offsets = load("frontier_offsets").tolist()
+    engine.frontiers = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        frontier = Frontier()
+        frontier.ids = ids[start:end]
+        frontier.children = children[start:end]
+        frontier.slots = dict(zip(frontier.ids, range(end - start)))
+        engine.frontiers.append(frontier)
+
+    engine.attempts = meta["attempts"]
+    version, state, gauss = meta["rng"]
+    engine.rng.setstate((version, tuple(state), gauss))
+    engine.np_rng.bit_generator.state = meta["np_rng"]
+    return engine
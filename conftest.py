@@ -0,0 +1,2 @@
+# Here so that pytest puts this folder on sys.path and the tests in tests/
+# can import the modules next to it.
@@ -0,0 +1,249 @@
+"""
+A faster way for the 2D scripts to grow the same kind of tree: the free
+particles are diffusion limited aggregation (DLA) walkers that start on a
+circle just round the tree and take big steps wherever the tree is far away.
+
+In the swarm (swarm.py) the particles come in at the window's corners and
+move at most MAXSPEED pixels a tick, so nearly all the time goes on
+particles nowhere near the tree. A DLASwarm does what the DLA programs do:
+
+    walkers are launched on a circle a little way outside the tree, at a
+    random angle, since a random walker coming from far away is equally
+    likely to arrive anywhere on it
+
+    a walker that gets further than twice that away, or leaves the window,
+    is put back on the circle where a random walk from there would first
+    come back to it (for a walker r from the middle and a circle of radius
+    R that is a wrapped Cauchy distribution round its own angle with
+    rho = R/r)
+
+    a walker with room round it jumps to a random point on a circle as big
+    as the room it has. A random walk that starts in the middle of an empty
+    circle first leaves it at a random point on it, so the jump is the same
+    as all the little steps it replaces, only quicker.
+
+    near the tree (and the oval script's ellipse) it takes steps of one
+    pixel up, down, left or right, and sticks when it overlaps the tree
+
+The room a walker has comes from a coarse map of how far every cell of
+cell x cell pixels is from the tree, brought up to date whenever particles
+stick. The walkers don't bump into each other the way swarm particles do,
+since DLA walkers come one at a time, so the trees are DLA trees: compare
+the fractal dimension of trees grown with jumps and without (jumps=False).
+"""
+import numpy as np
+
+from swarm import Swarm
+
+
+class DLASwarm(Swarm):
+    """
+    width, height, size, max_speed, tree, seed - the same as for a Swarm
+    center - (x, y) the launch circle goes round
+    obstacle - a Boundary (see boundary.py) the walkers' middles stay out of,
+               or None
+    cell - size in pixels of the cells of the distance map
+    jumps - False for one pixel steps everywhere, to compare against
+    """
+
+    def __init__(self, width, height, size, max_speed, tree, center,
+                 obstacle=None, seed=None, cell=8, jumps=True):
+        self.center = (float(center[0]), float(center[1]))
+        self.obstacle = obstacle
+        self.cell = cell
+        self.jumps = jumps
+        Swarm.__init__(self, width, height, size, max_speed, tree, seed)
+        across = -(-width//cell)
+        down = -(-height//cell)
+        # The top left corners of the walkers in a cell are from cell_x0 to
+        # cell_x0 + cell - 1, so the walkers cover up to cell_x1.
+        self.cell_x0 = np.arange(across)*cell
+        self.cell_y0 = np.arange(down)*cell
+        self.obstacle_room = self._obstacle_room()
+        self.clear_map()
+
+    def clear(self):
+        Swarm.clear(self)
+        if hasattr(self, "obstacle_room"):
+            self.clear_map()
+
+    # Forgets the tree, for when it has been cleared.
+    def clear_map(self):
+        # How far the walkers in each cell are from the tree, at least.
+        self.room = self.obstacle_room.copy()
+        # How many of tree.squares are in the map.
+        self.mapped = 0
+        # How far the tree reaches from center.
+        self.reach = 0.0
+
+    # How far the top left corners of the walkers in each cell are from any
+    # place where a walker's middle would be inside the obstacle.
+    def _obstacle_room(self):
+        room = np.full((len(self.cell_x0), len(self.cell_y0)), np.inf)
+        if self.obstacle is None:
+            return room
+        solid = self.obstacle.solid
+        padded = np.pad(solid, 1)
+        edge = solid & ~(padded[:-2, 1:-1] & padded[2:, 1:-1]
+                         & padded[1:-1, :-2] & padded[1:-1, 2:])
+        half = self.size//2
+        ox, oy = np.nonzero(edge)
+        ox, oy = ox - half, oy - half
+        for i in range(0, len(ox), 256):
+            gx = np.maximum(0, np.maximum(
+                ox[None, i:i + 256] - (self.cell_x0[:, None] + self.cell - 1),
+                self.cell_x0[:, None] - ox[None, i:i + 256]))
+            gy = np.maximum(0, np.maximum(
+                oy[None, i:i + 256] - (self.cell_y0[:, None] + self.cell - 1),
+                self.cell_y0[:, None] - oy[None, i:i + 256]))
+            room = np.minimum(room, np.sqrt(gx[:, None, :]**2
+                                            + gy[None, :, :]**2).min(axis=2))
+        return room
+
+    # Brings the map and the reach up to date with the squares added to the
+    # tree since last time, whoever added them.
+    def _map_new_squares(self):
+        squares = self.tree.squares[self.mapped:]
+        if not squares:
+            return
+        self.mapped = len(self.tree.squares)
+        squares = np.array(squares, dtype=float).reshape(-1, 4)
+        sx, sy, sw, sh = squares.T
+        far_x = np.maximum(abs(sx - self.center[0]),
+                           abs(sx + sw - self.center[0]))
+        far_y = np.maximum(abs(sy - self.center[1]),
+                           abs(sy + sh - self.center[1]))
+        self.reach = max(self.reach, float(np.hypot(far_x, far_y).max()))
+        x1 = self.cell_x0 + self.cell - 1 + self.size
+        y1 = self.cell_y0 + self.cell - 1 + self.size
+        for i in range(0, len(sx), 64):
+            part = slice(i, i + 64)
+            gx = np.maximum(0, np.maximum(sx[None, part] - x1[:, None],
+                                          self.cell_x0[:, None]
+                                          - (sx + sw)[None, part]))
+            gy = np.maximum(0, np.maximum(sy[None, part] - y1[:, None],
+                                          self.cell_y0[:, None]
+                                          - (sy + sh)[None, part]))
+            self.room = np.minimum(self.room,
+                                   np.sqrt(gx[:, None, :]**2
+                                           + gy[None, :, :]**2).min(axis=2))
+
+    # Radius of the launch circle, far enough out that a walker on it can't
+    # touch the tree.
+    def launch_radius(self):
+        return self.reach + 2*self.size + 2
+
+    # Top left corners of walkers with their middles on the launch circle
+    # at the given angles, and which of them are somewhere a walker can be.
+    def _on_circle(self, angle):
+        r = self.launch_radius()
+        half = self.size//2
+        x = np.rint(self.center[0] + r*np.cos(angle)).astype(np.int32) - half
+        y = np.rint(self.center[1] + r*np.sin(angle)).astype(np.int32) - half
+        ok = self._in_window(x, y)
+        if self.obstacle is not None:
+            ok &= ~self.obstacle.inside_many(x + half, y + half)
+        return x, y, ok
+
+    def _in_window(self, x, y):
+        return ((x >= 0) & (y >= 0) & (x + self.size <= self.width)
+                & (y + self.size <= self.height))
+
+    # Angles on the launch circle for walkers to go back to, given the
+    # angles and distances from center they are at now.
+    def _return_angles(self, angle, distance):
+        rho = np.minimum(self.launch_radius()/np.maximum(distance, 1e-9), 1.0)
+        u = self.rng.random(len(angle))
+        return angle + 2*np.arctan((1 - rho)/(1 + rho)*np.tan(np.pi*(u - 0.5)))
+
+    # Puts walkers on the launch circle at the given angles. Where the
+    # circle is off the window or inside the obstacle they get random angles
+    # instead, and if there is still nowhere to put them they are dropped.
+    # Returns their top left corners.
+    def _place(self, angle):
+        x, y, ok = self._on_circle(angle)
+        for attempt in range(20):
+            if ok.all():
+                break
+            redo = ~ok
+            x[redo], y[redo], ok[redo] = self._on_circle(
+                self.rng.uniform(0, 2*np.pi, int(redo.sum())))
+        return x[ok], y[ok]
+
+    # Adds n walkers on the launch circle, each anywhere on it.
+    def launch(self, n):
+        if n <= 0:
+            return
+        self._map_new_squares()
+        x, y = self._place(self.rng.uniform(0, 2*np.pi, n))
+        self.spawn(x, y)
+
+    # One tick for every walker. Returns the number that stuck.
+    def step(self):
+        self._map_new_squares()
+        if not len(self.x):
+            self.stuck_x = self.stuck_y = self.x
+            return 0
+        half = self.size//2
+
+        # Walkers too far away or off the window go back to the circle.
+        dx = self.x + half - self.center[0]
+        dy = self.y + half - self.center[1]
+        distance = np.hypot(dx, dy)
+        lost = (distance > 2*self.launch_radius()) | ~self._in_window(self.x, self.y)
+        if lost.any():
+            x, y, ok = self._on_circle(self._return_angles(
+                np.arctan2(dy[lost], dx[lost]), distance[lost]))
+            keep = np.ones(len(self.x), dtype=bool)
+            if not ok.all():
+                # Somewhere else on the circle, the same as a new walker.
+                redo = ~ok
+                x[redo], y[redo], ok[redo] = self._on_circle(
+                    self.rng.uniform(0, 2*np.pi, int(redo.sum())))
+                keep[np.nonzero(lost)[0][~ok]] = False
+            self.x[lost], self.y[lost] = x, y
+            if not keep.all():
+                self._keep(keep)
+
+        stuck = self.tree.hits_many(self.x, self.y, self.size)
+        self.stuck_x, self.stuck_y = self.x[stuck], self.y[stuck]
+        if stuck.any():
+            self._keep(~stuck)
+            self.tree.add_many(self.stuck_x, self.stuck_y, self.size)
+            self.stuck += len(self.stuck_x)
+            self._map_new_squares()
+        if not len(self.x):
+            return len(self.stuck_x)
+
+        # Rounding a jump moves a walker up to 0.71 pixels further, so it
+        # jumps one less than the room it has.
+        n = len(self.x)
+        if self.jumps:
+            cx = np.clip(self.x//self.cell, 0, self.room.shape[0] - 1)
+            cy = np.clip(self.y//self.cell, 0, self.room.shape[1] - 1)
+            jump = np.minimum(self.room[cx, cy] - 1, 2*self.launch_radius())
+            far = jump >= 1
+        else:
+            far = np.zeros(n, dtype=bool)
+        if far.any():
+            angle = self.rng.uniform(0, 2*np.pi, int(far.sum()))
+            self.x[far] += np.rint(jump[far]*np.cos(angle)).astype(np.int32)
+            self.y[far] += np.rint(jump[far]*np.sin(angle)).astype(np.int32)
+        near = ~far
+        if near.any():
+            # One pixel up, down, left or right.
+            way = self.rng.integers(0, 4, int(near.sum()))
+            x = self.x[near] + (way == 0) - (way == 1)
+            y = self.y[near] + (way == 2) - (way == 3)
+            if self.obstacle is not None:
+                # Into the obstacle it stays where it is.
+                ok = ~self.obstacle.inside_many(x + half, y + half)
+                x = np.where(ok, x, self.x[near])
+                y = np.where(ok, y, self.y[near])
+            self.x[near], self.y[near] = x, y
+        return len(self.stuck_x)
+
+    # Keeps only the walkers marked True.
+    def _keep(self, keep):
+        self.x, self.y = self.x[keep], self.y[keep]
+        self.vx, self.vy = self.vx[keep], self.vy[keep]
@@ -0,0 +1,175 @@
+"""
+Grows many 3D Brownian trees at once for research runs: every combination of
+the chosen parameters, runs times each, on a pool of worker processes (one
+per core by default). Each tree is an independent GrowthEngine with its own
+seed, so the runs don't share anything and the speedup is close to the
+number of cores.
+
+    python ensemble.py --simulation one two --distance 20 35 50 --runs 100 -o results.npz
+    python ensemble.py --simulation cerebellum --roots 4 5 --runs 200 --spheres 20000
+
+The distance only matters for the two point simulation and the number of
+roots only for the cerebellum one, so the other simulations are run once per
+--runs, not once per distance or number of roots.
+
+The results go in one .npz file with a column (array) per field and a row
+per tree, in the order the runs were set up:
+
+    seed, sphere_size, simulation, dist_btw, four_roots   the parameters
+    spheres       spheres in the tree at the end
+    attempts      growth attempts (steps) made
+    rejection     fraction of the attempts that added nothing
+    extent        (x, y, z) size of the box around the tree
+    max_distance  furthest sphere from (0, 0, 0)
+    finished      True if every root burned out before the limits
+    seconds       CPU time the run took
+"""
+from multiprocessing import Pool
+import argparse
+import os
+import time
+
+import numpy as np
+
+from growth_engine import GrowthEngine
+
+SIMULATIONS = ["one", "two", "cerebellum"]
+COLUMNS = ["seed", "sphere_size", "simulation", "dist_btw", "four_roots",
+           "spheres", "attempts", "rejection", "extent", "max_distance",
+           "finished", "seconds"]
+
+
+# The (sphere_size, simulation, dist_btw, four_roots) combinations to run.
+def parameter_sets(sphere_size, simulations, distances, roots):
+    sets = []
+    for simulation in simulations:
+        if simulation == 2:
+            for dist_btw in distances:
+                sets.append((sphere_size, 2, dist_btw, True))
+        elif simulation == 3:
+            for count in roots:
+                sets.append((sphere_size, 3, distances[0], count == 4))
+        else:
+            sets.append((sphere_size, simulation, distances[0], True))
+    return sets
+
+
+# Grows one tree and sums it up. Runs in a worker process, so it takes and
+# returns plain values.
+def run_one(job):
+    seed, (sphere_size, simulation, dist_btw, four_roots), limits = job
+    max_spheres, max_attempts, batch_size = limits
+    # CPU time, so runs sharing a core don't count the time they waited.
+    start = time.process_time()
+    engine = GrowthEngine(sphere_size=sphere_size, simulation=simulation,
+                          dist_btw=dist_btw, four_roots=four_roots, seed=seed)
+    roots = len(engine.sphere_list)
+    engine.run(max_spheres=max_spheres, max_attempts=max_attempts,
+               batch_size=batch_size)
+    seconds = time.process_time() - start
+
+    n = len(engine.sphere_list)
+    positions = engine.positions[:n]
+    added = n - roots
+    attempts = engine.attempts
+    return {"seed": seed,
+            "sphere_size": sphere_size,
+            "simulation": simulation,
+            "dist_btw": dist_btw,
+            "four_roots": four_roots,
+            "spheres": n,
+            "attempts": attempts,
+            "rejection": 1 - added/attempts if attempts else 0.0,
+            "extent": positions.max(axis=0) - positions.min(axis=0),
+            "max_distance": np.sqrt((positions*positions).sum(axis=1)).max(),
+            "finished": engine.finished(),
+            "seconds": seconds}
+
+
+# Runs every job on a pool of workers and returns the summaries in job
+# order. progress, if given, is called after each run with the number done.
+def run_ensemble(jobs, workers=None, progress=None):
+    results = [None]*len(jobs)
+    with Pool(workers) as pool:
+        # One job at a time per worker; a tree is plenty of work to be worth
+        # sending over, and big ones would leave the other workers idle at the
+        # end if they were handed out in chunks.
+        done = pool.imap_unordered(_run_numbered, list(enumerate(jobs)),
+                                   chunksize=1)
+        for count, (i, summary) in enumerate(done, 1):
+            results[i] = summary
+            if progress is not None:
+                progress(count)
+    return results
+
+
+def _run_numbered(numbered_job):
+    i, job = numbered_job
+    return i, run_one(job)
+
+
+def save_results(path, results):
+    columns = {}
+    for name in COLUMNS:
+        columns[name] = np.array([summary[name] for summary in results])
+    np.savez(path, **columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Grow many seeded 3D Brownian trees in parallel and sum them up.")
+    parser.add_argument("--size", type=int, default=5,
+                        help="sphere size (default 5)")
+    parser.add_argument("--simulation", choices=SIMULATIONS, nargs="+",
+                        default=["one"], help="simulations to run (default one)")
+    parser.add_argument("--distance", type=int, nargs="+", default=[35],
+                        help="distances between the two points (default 35)")
+    parser.add_argument("--roots", type=int, nargs="+", choices=[4, 5],
+                        default=[4], help="roots in the cerebellum simulation (default 4)")
+    parser.add_argument("--runs", type=int, default=10,
+                        help="trees per parameter set (default 10)")
+    parser.add_argument("--spheres", type=int, default=5000,
+                        help="stop each tree at this many spheres (default 5000)")
+    parser.add_argument("--attempts", type=int, default=None,
+                        help="stop each tree after this many growth attempts")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="tries drawn and scored together per root (default 1)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first run; the others count up from it")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default one per core)")
+    parser.add_argument("-o", "--output", default="results.npz",
+                        help="where to write the results (default results.npz)")
+    args = parser.parse_args()
+
+    sets = parameter_sets(args.size,
+                          [SIMULATIONS.index(name) + 1 for name in args.simulation],
+                          args.distance, args.roots)
+    limits = (args.spheres, args.attempts, args.batch)
+    jobs = []
+    for params in sets:
+        for run in range(args.runs):
+            jobs.append((args.seed + len(jobs), params, limits))
+
+    workers = args.workers or os.cpu_count()
+    print("%d trees (%d parameter sets x %d runs) on %d workers"
+          % (len(jobs), len(sets), args.runs, workers))
+
+    def progress(count):
+        if count % max(1, len(jobs)//20) == 0 or count == len(jobs):
+            print("  %d/%d" % (count, len(jobs)))
+
+    start = time.perf_counter()
+    results = run_ensemble(jobs, workers, progress)
+    elapsed = time.perf_counter() - start
+    save_results(args.output, results)
+
+    # The CPU time of the runs added together against the wall clock: how
+    # many cores' worth of work the pool got done.
+    busy = sum(summary["seconds"] for summary in results)
+    print("%.1f s of runs in %.1f s (%.2fx on %d workers), written to %s"
+          % (busy, elapsed, busy/elapsed, workers, args.output))
+
+
+if __name__ == "__main__":
+    main()
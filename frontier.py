@@ -0,0 +1,64 @@
+"""
+The frontier of one root of the 3D Brownian tree: the spheres that can still
+grow, and how many children each one has had.
+
+It used to be two lists side by side, one of spheres and one of counters,
+kept in step by hand. Finding a sphere's counter meant list.index(), and
+burning a sphere out meant list.remove() and del, so every try cost time in
+proportion to the size of the frontier. Here the ids and counters sit in two
+arrays with a map from id to slot. Picking at random, counting a child and
+burning a sphere out are all constant time: a burned out sphere's slot is
+filled by the last sphere in the arrays (swap and pop) instead of shifting
+everything after it down.
+"""
+
+
+class Frontier:
+
+    def __init__(self, spheres=()):
+        # ids[slot] is a sphere id and children[slot] its number of children.
+        self.ids = []
+        self.children = []
+        # sphere id -> slot
+        self.slots = {}
+        for sphere in spheres:
+            self.add(sphere)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, sphere):
+        return sphere in self.slots
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    # Adds a sphere with no children yet.
+    def add(self, sphere, children=0):
+        self.slots[sphere] = len(self.ids)
+        self.ids.append(sphere)
+        self.children.append(children)
+
+    # A sphere picked with randint(0, len(self) - 1), so the caller decides
+    # where the randomness comes from.
+    def pick(self, randint):
+        return self.ids[randint(0, len(self.ids) - 1)]
+
+    def child_count(self, sphere):
+        return self.children[self.slots[sphere]]
+
+    # Counts one more child for the sphere and returns its new count.
+    def add_child(self, sphere):
+        slot = self.slots[sphere]
+        self.children[slot] += 1
+        return self.children[slot]
+
+    # Takes a sphere out of the frontier (it burned out).
+    def remove(self, sphere):
+        slot = self.slots.pop(sphere)
+        last = self.ids.pop()
+        last_children = self.children.pop()
+        if last != sphere:
+            self.ids[slot] = last
+            self.children[slot] = last_children
+            self.slots[last] = slot
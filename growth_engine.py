@@ -0,0 +1,669 @@
+"""
+Headless growth engine for the 3D Brownian tree in main.py. It holds the
+growth rules without any Panda3D: the sphere size, the one point, two point
+and cerebellum (four or five roots) simulations, the rule that a node burns out
+after two children and the crowding check. The Panda3D viewer in main.py only
+draws what the engine grows.
+
+Run it on its own to grow a tree as fast as the CPU allows and write it to an
+.npz file (positions, which root each sphere grew from, and the root colors):
+
+    python growth_engine.py --simulation cerebellum --five --spheres 20000 -o tree.npz
+
+With --batch K the engine draws K (sphere, vector) tries at a time and scores
+them all at once with NumPy instead of one at a time (see attempt_batch).
+
+Every frontier sphere remembers which of its directions are already blocked
+by other spheres, so tries that are sure to fail are skipped without
+measuring anything, and a sphere that can't grow any more (boxed in or
+crowded) leaves the frontier the first time that is found out. The rules for
+placing a sphere are the same as ever, and every open (sphere, direction)
+pair is as likely to be picked as before; only far fewer tries are wasted.
+
+Every sphere keeps the set of whole number distances to its neighbors that
+the crowding rule counts, updated as spheres are placed near it, so the
+crowding check is a lookup. --verify checks every lookup against the
+distances to every sphere in the tree.
+
+With --log FILE every sphere is also written to a growth log as it grows,
+which replay.py can play back (see growth_log.py).
+
+With --checkpoint DIR the engine's whole state is written to DIR every
+--checkpoint-every spheres and at the end, and --resume DIR picks a run up
+from there exactly where it left off (see checkpoint.py):
+
+    python growth_engine.py --spheres 1000000 --checkpoint run1 --checkpoint-every 50000
+    python growth_engine.py --spheres 2000000 --resume run1 --checkpoint run1
+"""
+from math import sqrt
+import argparse
+import random
+import time
+
+import numpy as np
+
+from frontier import Frontier
+from growth_log import GrowthLog
+from spatial_hash import SpatialHash
+from vector_lattice import possible_vectors
+
+# The colors are plain (r, g, b, a) tuples so that nothing here needs Panda3D.
+# The RGBY(W) colors come from the cerebellum paper mentioned in main.py.
+GRAY = (0.4, 0.4, 0.4, 1)
+RGBYW = [(1, 0, 0, 1),
+         (0, 0.5, 0, 1),
+         (0, 0, 1, 1),
+         (1, 1, 0, 1),
+         (1, 1, 1, 1)]
+
+# Where the roots start in the cerebellum simulation. The fifth one is always
+# in the tree, but it only grows in the five point simulation.
+CEREBELLUM_ROOTS = [(-25, 0, 0), (25, 0, 0), (0, 0, 13), (0, 0, -17), (-25, 0, -17)]
+
+
+# Useful function for finding the Euclidean distance in 3D.
+def euclidean(vector1, vector2):
+    def square(x): return float(x)*float(x)
+    return sqrt(square(vector1[0] - vector2[0])
+                + square(vector1[1] - vector2[1])
+                + square(vector1[2] - vector2[2]))
+
+
+class GrowthEngine:
+    """
+    Grows one Brownian tree. The parameters are the ones from the start screen
+    in main.py:
+    sphere_size - sphere size
+    simulation - One point = 1, Two points = 2, Cerebellum simulation = 3
+    dist_btw - how far apart two points will be if you choose two
+    four_roots - How many points for the cerebellar simulation, 4 = True, 5 = False
+    color_scheme - What color scheme. Gray = 1, random = 2, RGBY(W) = 3
+    With plant=False the engine starts with no roots at all, for
+    checkpoint.load_checkpoint() to fill in.
+    """
+
+    def __init__(self, sphere_size=5, simulation=1, dist_btw=35,
+                 four_roots=True, color_scheme=1, seed=None, plant=True):
+        self.SPHERE_SIZE = sphere_size
+        self.simulation = simulation
+        self.DIST_BTW = dist_btw
+        self.four_roots = four_roots
+        self.color_scheme = color_scheme
+        self.rng = random.Random(seed)
+        # attempt_batch() draws its tries from NumPy.
+        self.np_rng = np.random.default_rng(seed)
+
+        self.radius = self.SPHERE_SIZE/1.5
+        # This is the extra distance between the spheres not immediately adjacent.
+        # extra_distance specifies how much crowding is allowed.
+        self.extra_distance = int(round(1.8*self.radius))
+        # Allowable vectors from a point, a radius distance away. They are
+        # cached per sphere size (see vector_lattice.py).
+        self.possible_vectors = possible_vectors(self.SPHERE_SIZE)
+        self.vector_array = np.array(self.possible_vectors, dtype=np.float64)
+        # A sphere further than this from a frontier sphere can't block any
+        # of its directions.
+        self.block_reach = int(self.radius) + float(
+            np.sqrt((self.vector_array*self.vector_array).sum(axis=1)).max())
+
+        # List of all the spheres and the root each one grew from. A sphere's
+        # index in sphere_list is its id everywhere else in the engine.
+        self.sphere_list = []
+        self.sphere_roots = []
+        # The same positions as sphere_list, as an array for NumPy. It has
+        # room to spare; only the first len(sphere_list) rows are spheres.
+        self.positions = np.zeros((1024, 3))
+        # One Frontier per root: the ids of the spheres that can actually
+        # grow, and a counter of children for each of those spheres.
+        self.frontiers = []
+        # Color of each root.
+        self.colors = []
+        # The open directions of frontier spheres: sphere id -> list of the
+        # indices into possible_vectors that no other sphere is in the way
+        # of, in order. A sphere's list is worked out the first time it is
+        # picked (see open_directions) and then kept up to date as spheres
+        # are placed near it (see block).
+        self.open = {}
+        self.attempts = 0
+        # Called with the id of each sphere that burns out, if set. A burned
+        # out sphere never changes again, which the viewer makes use of.
+        self.on_burn_out = None
+        # Called with the id of each new sphere, the id of the sphere it grew
+        # from and its root, if set (see growth_log.py).
+        self.on_grow = None
+
+        # Spatial hash of sphere ids.
+        self.sphere_index = SpatialHash(self.radius + self.extra_distance)
+        # What the crowding check needs to know about every sphere, by id:
+        # bit d of crowding[i] is set when sphere i has a neighbor a whole
+        # number distance d away, for every d under int(self.radius) +
+        # self.extra_distance. Spheres never move or go away, so a sphere's
+        # bits only change when another is placed near it, and add() sets
+        # them then instead of every try measuring all the neighbors again.
+        self.crowding = []
+        # With verify set, every crowding lookup is checked against the
+        # distances to every sphere in the tree (see check_crowding).
+        self.verify = False
+
+        if plant:
+            self.choose_roots()
+
+    # Useful function to make the color of the sphere random.
+    def random_color(self):
+        randint = self.rng.randint
+        return (float(randint(0, 100))/100,
+                float(randint(0, 100))/100,
+                float(randint(0, 100))/100,
+                1)
+
+    def choose_roots(self):
+        # one sphere at (0, 0, 0)
+        if self.simulation == 1:
+            self.sphere_list = [(0, 0, 0)]
+
+            if self.color_scheme == 1:
+                self.colors = [GRAY]
+            # Choose random color
+            elif self.color_scheme == 2:
+                self.colors = [self.random_color()]
+            elif self.color_scheme == 3:
+                self.colors = [RGBYW[self.rng.randint(0, 4)]]
+
+        # Two spheres DIST_BTW apart.
+        elif self.simulation == 2:
+            self.sphere_list = [(-self.DIST_BTW/2, 0, 0),
+                                (self.DIST_BTW/2, 0, 0)]
+
+            if self.color_scheme == 1:
+                self.colors = [GRAY, (0.6, 0.6, 0.6, 1)]
+            elif self.color_scheme == 2:
+                self.colors = [self.random_color() for i in range(2)]
+            elif self.color_scheme == 3:
+                self.colors = [RGBYW[self.rng.randint(0, 4)] for i in range(2)]
+
+        elif self.simulation == 3:
+            self.sphere_list = list(CEREBELLUM_ROOTS)
+
+            if self.color_scheme == 1:
+                self.colors = [(float(i)/10, float(i)/10, float(i)/10, 1)
+                               for i in range(3, 8)]
+            elif self.color_scheme == 2:
+                self.colors = [self.random_color() for i in range(5)]
+            elif self.color_scheme == 3:
+                self.colors = list(RGBYW)
+
+        else:
+            raise ValueError("simulation must be 1, 2 or 3, not %r"
+                             % (self.simulation,))
+
+        # Number of roots that actually grow.
+        if self.simulation == 3 and self.four_roots:
+            roots = 4
+        else:
+            roots = len(self.sphere_list)
+        self.colors = self.colors[:roots]
+
+        # Every root goes into the spatial hash, including the fifth
+        # cerebellum root in the four point simulation. It never grows or gets
+        # drawn, but the other spheres have always kept away from it.
+        root_spheres = self.sphere_list
+        self.sphere_list = []
+        for i, sphere in enumerate(root_spheres):
+            self.add(sphere, i)
+        self.frontiers = [Frontier([i]) for i in range(roots)]
+
+    # Puts a sphere in the tree (but not in any list of spheres that can
+    # grow) and returns its id. With neighbors=False nobody's crowding bits
+    # are set, its own included; parallel_roots.py does that for spheres
+    # too far from any it grows itself for their bits to matter to it.
+    def add(self, sphere, root, neighbors=True):
+        n = len(self.sphere_list)
+        if n == len(self.positions):
+            self.positions = np.concatenate([self.positions,
+                                             np.zeros_like(self.positions)])
+        self.positions[n] = sphere
+        self.sphere_list.append(sphere)
+        self.sphere_roots.append(root)
+        self.crowding.append(0)
+        if neighbors:
+            self.note_neighbors(n)
+        self.sphere_index.insert(sphere, n)
+        return n
+
+    # Sets the crowding bits between the sphere with id new and the spheres
+    # near it that are already in the spatial hash.
+    def note_neighbors(self, new):
+        reach = int(self.radius) + self.extra_distance
+        ids = self.sphere_index.nearby(self.sphere_list[new], reach)
+        if not ids:
+            return
+        ids = np.array(ids, dtype=np.int64)
+        distances = self.int_distances(self.positions[ids],
+                                       self.positions[new][None, :])
+        close = distances < reach
+        crowding = self.crowding
+        bits = 0
+        for i, d in zip(ids[close].tolist(), distances[close].tolist()):
+            crowding[i] |= 1 << d
+            bits |= 1 << d
+        crowding[new] |= bits
+
+    # Works every sphere's crowding bits out from scratch, for an engine
+    # whose spheres were put in without add().
+    def rebuild_crowding(self):
+        reach = int(self.radius) + self.extra_distance
+        crowding = self.crowding = [0]*len(self.sphere_list)
+        for sphere, center in enumerate(self.sphere_list):
+            ids = np.array(self.sphere_index.nearby(center, reach), dtype=np.int64)
+            distances = self.int_distances(self.positions[ids],
+                                           self.positions[sphere][None, :])
+            bits = 0
+            for d in set(distances[(distances < reach) & (ids != sphere)].tolist()):
+                bits |= 1 << d
+            crowding[sphere] = bits
+
+    # True when a sphere has neighbors at more than five different whole
+    # number distances under int(self.radius) + self.extra_distance. Then it
+    # can never grow again, since crowding only gets worse.
+    def crowded(self, sphere):
+        if self.verify:
+            self.check_crowding(sphere)
+        return bin(self.crowding[sphere]).count("1") > 5
+
+    # Measures the distance from a sphere to every other sphere in the tree,
+    # the slow way, and raises RuntimeError if its crowding bits don't
+    # match.
+    def check_crowding(self, sphere):
+        reach = int(self.radius) + self.extra_distance
+        n = len(self.sphere_list)
+        distances = self.int_distances(self.positions[:n],
+                                       self.positions[sphere][None, :])
+        distances[sphere] = reach
+        bits = 0
+        for d in set(distances[distances < reach].tolist()):
+            bits |= 1 << d
+        if bits != self.crowding[sphere]:
+            raise RuntimeError("sphere %d has crowding bits %s, but its "
+                               "neighbors give %s"
+                               % (sphere, bin(self.crowding[sphere]), bin(bits)))
+
+    @property
+    def roots(self):
+        return len(self.frontiers)
+
+    # True once every root has burned out and nothing more can grow.
+    def finished(self):
+        return not any(self.frontiers)
+
+    # Takes a sphere out of its root's frontier for good.
+    def retire(self, root, sphere):
+        self.frontiers[root].remove(sphere)
+        self.open.pop(sphere, None)
+        if self.on_burn_out is not None:
+            self.on_burn_out(sphere)
+
+    # The directions a sphere can still grow in. A direction is blocked when
+    # some other sphere is closer than int(self.radius) to where the new
+    # sphere would go, and since spheres are never taken away it stays
+    # blocked, so growing only ever tries the open ones. The chosen sphere
+    # itself still gets the full check in attempt(); this only skips tries
+    # that are sure to fail.
+    def open_directions(self, sphere):
+        directions = self.open.get(sphere)
+        if directions is None:
+            center = self.positions[sphere]
+            ids = np.array(self.sphere_index.nearby(center, self.block_reach),
+                           dtype=np.int64)
+            others = self.positions[ids]
+            offsets = others - center
+            near = ((offsets*offsets).sum(axis=1) < (self.block_reach + 1)**2) & (ids != sphere)
+            # Every direction against every sphere near enough at once, the
+            # same sums as int_distances().
+            d = (center + self.vector_array)[:, None, :] - others[near][None, :, :]
+            distances = np.sqrt(d[:, :, 0]*d[:, :, 0]
+                                + d[:, :, 1]*d[:, :, 1]
+                                + d[:, :, 2]*d[:, :, 2]).astype(np.int64)
+            blocked = (distances < int(self.radius)).any(axis=1)
+            directions = np.flatnonzero(~blocked).tolist()
+            self.open[sphere] = directions
+        return directions
+
+    # Closes the directions of the nearby frontier spheres that the new
+    # sphere with id new is in the way of.
+    def block(self, new):
+        position = self.positions[new][None, :]
+        reach = int(self.radius)
+        for i in self.sphere_index.nearby(self.sphere_list[new], self.block_reach):
+            directions = self.open.get(i)
+            if not directions or i == new:
+                continue
+            points = self.positions[i] + self.vector_array[directions]
+            blocked = self.int_distances(points, position) < reach
+            if blocked.any():
+                self.open[i] = [n for n, closed in zip(directions, blocked.tolist())
+                                if not closed]
+
+    # Whole number distances from center to the spheres in the spatial hash
+    # that are closer than reach. The sphere with id chosen is left out if
+    # skip_chosen is True.
+    def nearby_distances(self, center, reach, chosen, skip_chosen):
+        sphere_list = self.sphere_list
+        distances = []
+        for i in self.sphere_index.nearby(center, reach):
+            if skip_chosen and i == chosen:
+                continue
+            distance = int(euclidean(center, sphere_list[i]))
+            if distance < reach:
+                distances.append(distance)
+        return distances
+
+    # One try at growing a sphere from the given root. Returns the new
+    # sphere, or None if nothing was added.
+    def attempt(self, root):
+        frontier = self.frontiers[root]
+        if not frontier:
+            return None
+        self.attempts += 1
+        randint = self.rng.randint
+
+        # Select randomly from the spheres that can grow and from the list of
+        # possible vectors, as always, but skip the draws that land on a
+        # blocked direction instead of measuring them only to fail. The j-th
+        # draw of the vectors stands for the j-th open direction, so every
+        # open (sphere, vector) pair is still as likely as every other one.
+        while True:
+            chosen = frontier.pick(randint)
+            directions = self.open_directions(chosen)
+            if not directions:
+                # Boxed in: it can never grow again.
+                self.retire(root, chosen)
+                return None
+            j = randint(0, len(self.possible_vectors) - 1)
+            if j < len(directions):
+                break
+        chosen_sphere = self.sphere_list[chosen]
+        chosen_vector = self.possible_vectors[directions[j]]
+
+        # add the vectors together to get a new location
+        # for a sphere
+        x = chosen_sphere[0] + chosen_vector[0]
+        y = chosen_sphere[1] + chosen_vector[1]
+        z = chosen_sphere[2] + chosen_vector[2]
+
+        # Distances from where the new sphere will be drawn to the spheres
+        # close enough to get in its way. The spatial hash hands back only the
+        # spheres in nearby cells, so this doesn't grow with the tree. The
+        # chosen_sphere is skipped, unless it is the only sphere there is.
+        skip_chosen = len(self.sphere_list) > 1
+        distances = self.nearby_distances((x, y, z), int(self.radius),
+                                          chosen, skip_chosen)
+
+        new_sphere = None
+        # The new sphere has to be a 'radius' distance away from all the other
+        # spheres. Then the chosen_sphere can't be crowded: no more than five
+        # different (whole number) distances to its neighbors may fall under
+        # int(self.radius) + self.extra_distance (see crowded).
+        if not distances:
+            if frontier.child_count(chosen) <= 1:
+                if not self.crowded(chosen):
+                    new_sphere = (x, y, z)
+                    new = self.add(new_sphere, root)
+                    frontier.add(new)
+                    # The chosen_sphere counter goes up by one.
+                    frontier.add_child(chosen)
+                    if self.on_grow is not None:
+                        self.on_grow(new, chosen, root)
+                else:
+                    # Crowding only gets worse as the tree grows, so the
+                    # chosen_sphere can never grow again.
+                    self.retire(root, chosen)
+                    return None
+
+            # The only available spheres for selection are the outside
+            # ones in sphere_list. They 'burn out' after the number chosen
+            # in the if statement.
+            if frontier.child_count(chosen) > 1:
+                self.retire(root, chosen)
+
+            if new_sphere is not None:
+                self.block(new)
+
+        return new_sphere
+
+    # The spheres that might be within reach of each of the points (an n x 3
+    # array), from the spatial hash. Returns two flat arrays, the row of the
+    # point and the sphere id, with one entry per (point, sphere) pair.
+    def gather(self, points, reach):
+        nearby = self.sphere_index.nearby
+        rows = []
+        ids = []
+        for row, point in enumerate(points.tolist()):
+            found = nearby(point, reach)
+            ids.extend(found)
+            rows.extend([row]*len(found))
+        return (np.array(rows, dtype=np.int64),
+                np.array(ids, dtype=np.int64))
+
+    # Which of the tries land within int(self.radius) of a sphere other than
+    # their own chosen sphere: chosen holds the sphere ids and vector_picks
+    # the indices into possible_vectors, one of each per try. Returns a bool
+    # array, True for the blocked ones.
+    def blocked_tries(self, chosen, vector_picks):
+        reach = int(self.radius)
+        candidates = self.positions[chosen] + self.vector_array[vector_picks]
+        rows, ids = self.gather(candidates, reach)
+        distances = self.int_distances(candidates[rows], self.positions[ids])
+        hits = (distances < reach) & (ids != chosen[rows])
+        return np.bincount(rows[hits], minlength=len(chosen)) > 0
+
+    # Whole number distances between the points in a and b (both n x 3
+    # arrays) row by row, the same as int(euclidean(...)) would give.
+    @staticmethod
+    def int_distances(a, b):
+        d = a - b
+        return np.sqrt(d[:, 0]*d[:, 0]
+                       + d[:, 1]*d[:, 1]
+                       + d[:, 2]*d[:, 2]).astype(np.int64)
+
+    # k tries at growing from the given root, drawn and scored together.
+    # The same rules as attempt(), but every (sphere, vector) pair is drawn
+    # up front and checked against the tree in one NumPy pass. The ones that
+    # pass are then added in the order they were drawn, checking each against
+    # the spheres this batch already added and against the burn out rule,
+    # since earlier tries in the batch may have used up the chosen sphere.
+    # Returns the list of new spheres.
+    def attempt_batch(self, root, k):
+        frontier = self.frontiers[root]
+        if not frontier:
+            return []
+        # A lone sphere counts itself as a neighbor (see attempt()), which
+        # stops being true as soon as anything grows, so start one at a time.
+        if len(self.sphere_list) == 1:
+            new_sphere = self.attempt(root)
+            return [] if new_sphere is None else [new_sphere]
+
+        reach = int(self.radius)
+        # (sphere, vector) pairs are drawn the way attempt() draws them,
+        # k at a time, keeping the ones that land on an open direction until
+        # there are k of them. Boxed in spheres are retired along the way.
+        chosen = []
+        vector_picks = []
+        retired = 0
+        while len(chosen) < k and frontier:
+            picks = self.np_rng.integers(0, len(frontier), k).tolist()
+            draws = self.np_rng.integers(0, len(self.possible_vectors), k).tolist()
+            boxed_in = set()
+            for pick, j in zip(picks, draws):
+                parent = frontier.ids[pick]
+                directions = self.open_directions(parent)
+                if not directions:
+                    boxed_in.add(parent)
+                elif j < len(directions):
+                    chosen.append(parent)
+                    vector_picks.append(directions[j])
+            for parent in sorted(boxed_in):
+                self.retire(root, parent)
+            retired += len(boxed_in)
+        # A sphere retired after some of its tries were kept is skipped below.
+        chosen = np.array(chosen[:k], dtype=np.int64)
+        vector_picks = np.array(vector_picks[:k], dtype=np.int64)
+        # The attempts made: one for every try measured and, as in
+        # attempt(), one for every boxed in sphere found. Fewer than k when
+        # the frontier runs out first.
+        self.attempts += len(chosen) + retired
+        if not len(chosen):
+            return []
+        blocked = self.blocked_tries(chosen, vector_picks)
+
+        new_spheres = []
+        for i in np.flatnonzero(~blocked).tolist():
+            parent = int(chosen[i])
+            # An earlier try in this batch may have burned it out.
+            if parent not in frontier:
+                continue
+            chosen_sphere = self.sphere_list[parent]
+            vector = self.possible_vectors[int(vector_picks[i])]
+            new_sphere = (chosen_sphere[0] + vector[0],
+                          chosen_sphere[1] + vector[1],
+                          chosen_sphere[2] + vector[2])
+            if any(int(euclidean(new_sphere, sphere)) < reach
+                   for sphere in new_spheres):
+                continue
+            # The spheres this batch already added count against it too.
+            if self.crowded(parent):
+                # Crowded for good, as in attempt().
+                self.retire(root, parent)
+                continue
+
+            new = self.add(new_sphere, root)
+            frontier.add(new)
+            new_spheres.append(new_sphere)
+            if self.on_grow is not None:
+                self.on_grow(new, parent, root)
+            if frontier.add_child(parent) > 1:
+                self.retire(root, parent)
+            self.block(new)
+
+        return new_spheres
+
+    # Grows the tree, one attempt (or one batch of batch_size attempts) per
+    # root in turn, until it has max_spheres spheres, max_attempts attempts
+    # have been made or every root is burned out. Returns the number of
+    # spheres added.
+    def run(self, max_spheres=None, max_attempts=None, batch_size=1):
+        start = len(self.sphere_list)
+        roots = range(self.roots)
+        while not self.finished():
+            if max_spheres is not None and len(self.sphere_list) >= max_spheres:
+                break
+            if max_attempts is not None and self.attempts >= max_attempts:
+                break
+            for root in roots:
+                if batch_size > 1:
+                    self.attempt_batch(root, batch_size)
+                else:
+                    self.attempt(root)
+        return len(self.sphere_list) - start
+
+    # Writes the tree to an .npz file.
+    def save(self, path):
+        np.savez_compressed(path,
+                            positions=np.array(self.sphere_list, dtype=np.float64),
+                            roots=np.array(self.sphere_roots, dtype=np.int8),
+                            colors=np.array(self.colors, dtype=np.float32),
+                            params=np.array([self.SPHERE_SIZE, self.simulation,
+                                             self.DIST_BTW, int(self.four_roots),
+                                             self.color_scheme]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Grow a 3D Brownian tree without opening a window.")
+    parser.add_argument("--size", type=int, default=5,
+                        help="sphere size (default 5)")
+    parser.add_argument("--simulation", choices=["one", "two", "cerebellum"],
+                        default="one", help="one point, two points or the "
+                        "cerebellum simulation (default one)")
+    parser.add_argument("--distance", type=int, default=35,
+                        help="how far apart the two points are (default 35)")
+    parser.add_argument("--five", action="store_true",
+                        help="five roots in the cerebellum simulation instead of four")
+    parser.add_argument("--colors", choices=["gray", "random", "rgby"],
+                        default="gray", help="color scheme (default gray)")
+    parser.add_argument("--spheres", type=int, default=10000,
+                        help="stop once the tree has this many spheres (default 10000)")
+    parser.add_argument("--attempts", type=int, default=None,
+                        help="stop after this many growth attempts")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="tries drawn and scored together per root (default 1)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed, for a repeatable tree")
+    parser.add_argument("-o", "--output", default="tree.npz",
+                        help="where to write the tree (default tree.npz)")
+    parser.add_argument("--checkpoint", default=None, metavar="DIR",
+                        help="write checkpoints of the run to this directory")
+    parser.add_argument("--checkpoint-every", type=int, default=None, metavar="N",
+                        help="write a checkpoint every N spheres (default only at the end)")
+    parser.add_argument("--resume", default=None, metavar="DIR",
+                        help="carry on from a checkpoint; the tree options are "
+                        "taken from it")
+    parser.add_argument("--verify", action="store_true",
+                        help="check every crowding lookup against the "
+                        "distances to every sphere (slow)")
+    parser.add_argument("--log", default=None, metavar="FILE",
+                        help="write every sphere to this growth log as it grows "
+                        "(carried on when resuming, otherwise written over)")
+    args = parser.parse_args()
+
+    # checkpoint.py imports this module, so it is only imported when needed.
+    if args.checkpoint or args.resume:
+        from checkpoint import save_checkpoint, load_checkpoint
+
+    if args.resume:
+        engine = load_checkpoint(args.resume)
+    else:
+        engine = GrowthEngine(
+            sphere_size=args.size,
+            simulation=["one", "two", "cerebellum"].index(args.simulation) + 1,
+            dist_btw=args.distance,
+            four_roots=not args.five,
+            color_scheme=["gray", "random", "rgby"].index(args.colors) + 1,
+            seed=args.seed)
+    engine.verify = args.verify
+
+    log = None
+    if args.log:
+        # A fresh run starts a fresh log, whatever is in the file.
+        log = GrowthLog(args.log, engine.SPHERE_SIZE, resume=bool(args.resume))
+        log.follow(engine)
+
+    start = time.perf_counter()
+    step = args.checkpoint_every if args.checkpoint else None
+    while True:
+        # Stopping between rounds and carrying on is the same as one long
+        # run(), so the checkpoints don't change the tree.
+        target = args.spheres
+        if step:
+            target = min(target, (len(engine.sphere_list)//step + 1)*step)
+        engine.run(max_spheres=target, max_attempts=args.attempts,
+                   batch_size=args.batch)
+        if args.checkpoint:
+            # The log has to be on disk as far as the checkpoint goes.
+            if log is not None:
+                log.flush()
+            save_checkpoint(engine, args.checkpoint)
+        if target == args.spheres or engine.finished() or (
+                args.attempts is not None and engine.attempts >= args.attempts):
+            break
+    elapsed = time.perf_counter() - start
+    if log is not None:
+        log.close()
+    engine.save(args.output)
+
+    print("%d spheres from %d attempts in %.2f s (%.0f spheres/s), written to %s"
+          % (len(engine.sphere_list), engine.attempts, elapsed,
+             len(engine.sphere_list)/max(elapsed, 1e-9), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Append only log of how a 3D Brownian tree grew, so a run can be looked at
+again (see replay.py) instead of growing a different tree every time.
+
+Every sphere in the tree is one fixed width record: its position, the id of
+the sphere it grew from (-1 for a root), the root it belongs to, its color and
+the step it grew at (the engine's attempt count at the time, so the gaps
+between spheres show how hard growing got). A sphere's id is its record
+number and parents are given by record number too. That is the engine's id,
+less the fifth cerebellum root in the four point simulation, which is never
+drawn and isn't logged.
+
+The file is a 16 byte header (MAGIC and the sphere size as a float64)
+followed by the records. Records are gathered in a NumPy buffer and written
+buffer_size at a time, so logging a sphere costs about as much as filling in
+one row of an array.
+"""
+import os
+
+import numpy as np
+
+MAGIC = b"BTREELG1"
+
+RECORD = np.dtype([("position", "<f8", (3,)),
+                   ("parent", "<i8"),
+                   ("root", "<i1"),
+                   ("color", "<f4", (4,)),
+                   ("step", "<i8")])
+
+
+class GrowthLog:
+
+    # With resume set the log carries on from where the one already at path
+    # got to (a run resumed from a checkpoint); otherwise a log that is
+    # already there is written over, so a new run never ends up mixed with
+    # an old one.
+    def __init__(self, path, sphere_size, resume=False, buffer_size=4096):
+        self.path = path
+        self.sphere_size = sphere_size
+        self.resume = resume
+        self.buffer = np.zeros(buffer_size, dtype=RECORD)
+        self.in_buffer = 0
+        if resume:
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                raise ValueError("%s has no growth log to carry on" % (path,))
+            logged_size = read_header(path)
+            if logged_size != sphere_size:
+                raise ValueError("%s is a log of sphere size %s, not %s"
+                                 % (path, logged_size, sphere_size))
+            self.file = open(path, "r+b")
+            self.file.seek(0, os.SEEK_END)
+            self.count = (self.file.tell() - 16)//RECORD.itemsize
+            # Drops a record cut short by a crash.
+            self.file.truncate(16 + self.count*RECORD.itemsize)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(path, "wb")
+            self.file.write(MAGIC + np.float64(sphere_size).tobytes())
+            self.count = 0
+        self.engine = None
+        # Engine ids of the spheres that aren't logged.
+        self.skipped = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, position, parent, root, color, step):
+        record = self.buffer[self.in_buffer]
+        record["position"] = position
+        record["parent"] = parent
+        record["root"] = root
+        record["color"] = color
+        record["step"] = step
+        self.in_buffer += 1
+        self.count += 1
+        if self.in_buffer == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.in_buffer:
+            self.file.write(self.buffer[:self.in_buffer].tobytes())
+            self.in_buffer = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    # Logs everything a GrowthEngine grows from now on. A new log starts with
+    # the spheres already in the engine (the roots), with no parent. A log
+    # being resumed has to be the log of the engine's tree so far, as when
+    # resuming from a checkpoint: the same roots in the same places, and at
+    # least as many spheres. Anything it has past the engine's tree grew
+    # after the checkpoint was taken and is cut off.
+    def follow(self, engine):
+        self.engine = engine
+        self.skipped = [i for i, root in enumerate(engine.sphere_roots[:engine.roots + 1])
+                        if root >= engine.roots]
+        logged = len(engine.sphere_list) - len(self.skipped)
+        if not self.resume:
+            for i, sphere in enumerate(engine.sphere_list):
+                root = engine.sphere_roots[i]
+                if root < engine.roots:
+                    self.add(sphere, -1, root, engine.colors[root],
+                             engine.attempts)
+            engine.on_grow = self.grown
+            return
+
+        # The roots are the first records, the only ones with no parent.
+        self.flush()
+        self.file.seek(16)
+        first = np.frombuffer(self.file.read((engine.roots + 1)*RECORD.itemsize),
+                              dtype=RECORD)
+        self.file.seek(0, os.SEEK_END)
+        logged_roots = first[first["parent"] == -1]
+        roots = [sphere for i, sphere in enumerate(engine.sphere_list[:engine.roots + 1])
+                 if i not in self.skipped]
+        if len(logged_roots) != engine.roots:
+            raise ValueError("%s is a log of a tree with %d roots, not %d"
+                             % (self.path, len(logged_roots), engine.roots))
+        if logged_roots["position"].tolist() != [list(root) for root in roots]:
+            raise ValueError("%s is a log of a tree with its roots somewhere else"
+                             % (self.path,))
+        if self.count >= logged:
+            self.flush()
+            self.file.truncate(16 + logged*RECORD.itemsize)
+            self.file.seek(0, os.SEEK_END)
+            self.count = logged
+        else:
+            raise ValueError("%s has %d spheres, fewer than the %d in the tree"
+                             % (self.path, self.count, logged))
+        engine.on_grow = self.grown
+
+    def grown(self, sphere, parent, root):
+        engine = self.engine
+        record = parent - sum(1 for i in self.skipped if i < parent)
+        self.add(engine.sphere_list[sphere], record, root,
+                 engine.colors[root], engine.attempts)
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        header = f.read(16)
+    if len(header) < 16 or header[:8] != MAGIC:
+        raise ValueError("%s is not a growth log" % (path,))
+    return float(np.frombuffer(header[8:], dtype="<f8")[0])
+
+
+# The sphere size and the records of a log, memory mapped, so even a long log
+# opens at once. A record cut short by a crash at the end is left off.
+def read_log(path):
+    sphere_size = read_header(path)
+    count = (os.path.getsize(path) - 16)//RECORD.itemsize
+    if count == 0:
+        return sphere_size, np.zeros(0, dtype=RECORD)
+    return sphere_size, np.memmap(path, dtype=RECORD, mode="r", offset=16,
+                                  shape=(count,))
@@ -0,0 +1,111 @@
+"""
+Runs the 2D Brownian tree scripts without a window or the input box, to grow
+trees in bulk on a machine with no display:
+
+    python "Brownian Tree Two Point.py" --headless --window 400 --distance 80 --particles 5000 -o two
+    python "Brownian tree oval with 5 roots.py" --headless --params oval.json --seconds 60 -o oval
+
+The parameters the input box asks for can be given as options or in a JSON
+file (--params) with the same names, {"window": 400, "size": 3}; options win
+over the file and the script's defaults fill in the rest. The run stops when
+the tree has --particles particles or after --seconds seconds, whichever
+comes first, and writes
+
+    NAME.png   the tree
+    NAME.npz   occupancy  the window's pixels, one bit each (np.packbits of
+                          a width x height bool array), 1 where the tree is
+               shape      (width, height)
+               order      width x height, the number of the particle that
+                          covered each pixel first, counting from 1 in the
+                          order they stuck (0 where there is no tree)
+               squares    (x, y, width, height) of every particle in the
+                          order they stuck, the roots first
+               steps, seconds
+
+The arrays are indexed [x, y], like pygame.surfarray.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+
+# The options every script takes, plus one for each of its parameters:
+# (name, default, help) in the order the input box returns them. Returns
+# the parsed options with the parameters as a list in args.params.
+def parse_args(description, parameters):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--headless", action="store_true",
+                        help="no window or input box; grow the tree and write "
+                        "it out")
+    parser.add_argument("--params", default=None, metavar="FILE",
+                        help="JSON file with any of the parameters below")
+    for name, default, text in parameters:
+        parser.add_argument("--" + name.replace("_", "-"), dest=name, type=int,
+                            default=None,
+                            help="%s (default %s)" % (text, default))
+    parser.add_argument("--swarm", action="store_true",
+                        help="step the free particles together in NumPy arrays "
+                        "instead of as sprites (see swarm.py)")
+    parser.add_argument("--dla", action="store_true",
+                        help="launch the free particles round the tree and "
+                        "let them jump where it is far away (see dla_swarm.py)")
+    parser.add_argument("--particles", type=int, default=10000,
+                        help="stop when the tree has this many particles "
+                        "(default 10000)")
+    parser.add_argument("--seconds", type=float, default=None,
+                        help="stop after this many seconds")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed, for a repeatable tree")
+    parser.add_argument("-o", "--output", default="tree",
+                        help="name of the .png and .npz files written "
+                        "(default tree)")
+    args = parser.parse_args()
+
+    from_file = {}
+    if args.params is not None:
+        with open(args.params) as f:
+            from_file = json.load(f)
+    args.params = []
+    for name, default, text in parameters:
+        value = getattr(args, name)
+        if value is None:
+            value = int(from_file.get(name, default))
+        args.params.append(value)
+    if args.headless:
+        # Has to be set before pygame.init().
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    return args
+
+
+# Takes steps until tree_size() reaches particles or seconds have gone by.
+# Returns the number of steps and the time taken.
+def run(step, tree_size, particles, seconds=None):
+    start = time.perf_counter()
+    deadline = None if seconds is None else start + seconds
+    steps = 0
+    while tree_size() < particles:
+        step()
+        steps += 1
+        # The clock is only read every so often; a step is quick.
+        if deadline is not None and steps % 16 == 0 \
+                and time.perf_counter() >= deadline:
+            break
+    return steps, time.perf_counter() - start
+
+
+# Writes name.png from the surface and name.npz from the tree's bitmap.
+def save(name, surface, tree, steps=0, seconds=0.0):
+    import pygame
+    pygame.image.save(surface, name + ".png")
+    occupied = tree.window()
+    np.savez_compressed(name + ".npz",
+                        occupancy=np.packbits(occupied),
+                        shape=np.array(occupied.shape),
+                        order=tree.order(),
+                        squares=np.array(tree.squares, dtype=np.int32).reshape(-1, 4),
+                        steps=steps,
+                        seconds=seconds)
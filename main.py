@@ -18,45 +18,58 @@ standard Panda3D mouse inputs. Left click, right click, both mouse buttons
 together. Left click moves the balls in the x and z planes, right click in the
 y plane. Both together rotates around (0, 0, 0).
 
+Press c to write a checkpoint of the tree to the checkpoint directory (it is
+also written every five minutes on its own), and start the program with
+
+    python main.py checkpoint
+
+to carry on growing from it instead of going through the start screen.
+With --log FILE every sphere is written to a growth log as it grows, which
+replay.py plays back.
+
+Press p to show (and p again to hide) the performance overlay: attempts and
+accepted spheres per second, why the other attempts failed, the share of the
+time spent in the distance scans and in load_sphere, the frontier and the
+number of nodes. With --perf FILE it starts on and the numbers are written to
+FILE (.csv or .jsonl) every second (see perf.py).
+
+With --walkers the roots grow by diffusion limited aggregation instead:
+thousands of random walkers wander over a voxel grid and stick where they
+touch the aggregate (see voxel_dla.py). The start screen is the same, and
+every cell that sticks is drawn as a sphere in its root's color.
+
 Note that the (x, y, z) coordinates in Panda3D are as follows:
 x - right and left
 y - in and out
 z - up and down
 """
-# Dependancies for math
-from math import pi, sin, cos, sqrt
-from random import randint
+import argparse
+import atexit
+import random
+import time
+# The growth rules live in growth_engine, this file only draws the tree.
+from growth_engine import GrowthEngine
+from checkpoint import save_checkpoint, load_checkpoint
+from growth_log import GrowthLog
+from perf import GrowthStats, PerfLog, describe
+from sphere_batch import SphereBatch, load_single_sphere
+from voxel_dla import VoxelDLA
 # Dependancies for Panda 3D
 from direct.showbase.ShowBase import ShowBase
 from direct.task import Task
 from direct.showbase import DirectObject
-from panda3d.core import AmbientLight, DirectionalLight, Material
+from panda3d.core import AmbientLight, DirectionalLight
 from panda3d.core import LVector3, Mat4, TextNode
 from pandac.PandaModules import VBase4
 from direct.gui.DirectGui import *
 from direct.gui.OnscreenText import OnscreenText
 from direct.interval.IntervalGlobal import *
 
-# Useful function to make the color of the sphere random.
-# No input, just outputs a random VBase4 color.
-def random_color():
-    random_color = VBase4(float(randint(0, 100))/100,
-                          float(randint(0, 100))/100,
-                          float(randint(0, 100))/100,
-                          1)
-    return random_color
-
-# Useful function for finding the Euclidean distance in 3D.
-def euclidean(vector1, vector2):
-    def square(x): return float(x)*float(x)
-    return sqrt(square(vector1[0] - vector2[0])
-                + square(vector1[1] - vector2[1])
-                + square(vector1[2] - vector2[2]))
-
 # Main class. 
 class main(ShowBase):
  
-    def __init__(self):
+    def __init__(self, resume=None, log_path=None, perf_path=None,
+                 walkers=False):
         ShowBase.__init__(self)
 
         self.SPHERE_SIZE = 5
@@ -77,24 +90,51 @@ class main(ShowBase):
         params[3] - How many points for the cerebellar simulation, 4 = True, 5 = False
         params[4] - What color scheme. Gray = 1, random = 2, RGBY(W) = 3
         """
-        # possible_vectors is calculated in self.calculate()
-        possible_vectors = []
-        self.possible_vectors = possible_vectors
-        # List of all the spheres.
-        sphere_list = []
-        self.sphere_list = sphere_list
-        # Lists of spheres that can actually grow.
-        self.outside_sphere_list0 = []
-        self.outside_sphere_list1 = []
-        self.outside_sphere_list2 = []
-        self.outside_sphere_list3 = []
-        self.outside_sphere_list4 = []
-        # Counters for the lists that can grow.
-        self.counter_list0 = []
-        self.counter_list1 = []
-        self.counter_list2 = []
-        self.counter_list3 = []
-        self.counter_list4 = []
+        # The GrowthEngine that grows the tree, made in self.calculate().
+        self.engine = None
+        # Draw the spheres with one shared model, material and pair of lights,
+        # combined into batches (see sphere_batch.py). False draws every
+        # sphere on its own, the original way.
+        self.batch_spheres = True
+        self.spheres = None
+        # Burned out spheres never change, so when batching they are merged
+        # into one Geom per chunk_size cube of space, every merge_every
+        # seconds, merging at most merge_chunks chunks at a time.
+        self.chunk_size = 50
+        self.merge_every = 0.5
+        self.merge_chunks = 4
+        # One task grows every root, round robin, for frame_budget
+        # milliseconds a frame, so growth speeds up with CPU headroom and the
+        # window stays responsive. With weight_roots, roots with more spheres
+        # that can grow get picked more often instead. grow_batch above 1
+        # scores that many tries at a time (see GrowthEngine.attempt_batch).
+        self.frame_budget = 10
+        self.weight_roots = False
+        self.grow_batch = 1
+        self.pick_root = random.Random()
+        # Where the c key and the checkpoint task write checkpoints (see
+        # checkpoint.py), and how many seconds apart the task does it. None
+        # turns the task off.
+        self.checkpoint_path = "checkpoint"
+        self.checkpoint_every = 300
+        # Growth log file (see growth_log.py), None for no log. It is only
+        # carried on when the tree comes from a checkpoint.
+        self.log_path = log_path
+        self.log = None
+        self.resumed = False
+        # The performance overlay's GrowthStats while it is on, and where
+        # to write its samples.
+        self.perf = None
+        self.perf_path = perf_path
+        self.perf_log = None
+        self.perf_text = None
+        # Walker mode (see voxel_dla.py): how many walkers step at once
+        # and how many cells the grid has on a side. A cell is one sphere
+        # radius across.
+        self.walkers = walkers
+        self.walker_count = 10000
+        self.grid_size = 512
+        self.dla = None
 
         # Set background color to white.
         base.setBackgroundColor(1,1,1)
@@ -123,7 +163,11 @@ class main(ShowBase):
         # quickly runs into limited size due to limiting factors in the
         # self.add_sphere() function. It can't be too crowded around a sphere
         # or else you can't see anything between the rendered spheres.
-        self.input_variables()
+        # A checkpoint to resume from skips the start screen.
+        if resume is not None:
+            self.resume(resume)
+        else:
+            self.input_variables()
 
     def input_variables(self):
         # Calls to the text and button widgets.      
@@ -293,315 +337,264 @@ class main(ShowBase):
         self.exit_button.destroy()
         # Call the meat of the program upon exit of start menu.
         self.calculate()
-        self.choose_and_run()
+        if self.walkers:
+            self.start_walkers()
+        else:
+            self.choose_and_run()
 
     def calculate(self):
         # one or two points or the cerebellum simulation
         self.SPHERE_SIZE = self.params[0]
         self.DIST_BTW = self.params[2]
-        self.radius = self.SPHERE_SIZE/1.5
-        self.extra_distance = int(round(1.8*self.radius))
-
-        # Allowable vectors from a point.
-        # Calculates number of possible vectors of a certain distance.
-        # That distance is proportional to radius.
-        # Turns degrees into radians 1 degree through 360 degrees.
-        thetas = [(float(i)*pi)/180 for i in range(360)]
-        phis = thetas
-
-        for theta in thetas:
-            for phi in phis:   
-                x = self.radius * sin(theta) * cos(phi)
-                y = self.radius * sin(theta) * sin(phi)
-                z = self.radius * cos(theta)
-                x = int(round(x))
-                y = int(round(y))
-                z = int(round(z))
-
-                self.possible_vectors.append((x, y, z))
-
-        self.possible_vectors = list(set(self.possible_vectors))
+        # The engine works out the radius, the crowding distance and the
+        # possible vectors from the sphere size.
+        self.engine = GrowthEngine(sphere_size=self.params[0],
+                                   simulation=self.params[1],
+                                   dist_btw=self.params[2],
+                                   four_roots=self.params[3],
+                                   color_scheme=self.params[4])
+        self.radius = self.engine.radius
+        self.extra_distance = self.engine.extra_distance
+
+    # Picks up a tree from a checkpoint, with the parameters it was started
+    # with.
+    def resume(self, path):
+        self.engine = load_checkpoint(path)
+        self.SPHERE_SIZE = self.engine.SPHERE_SIZE
+        self.DIST_BTW = self.engine.DIST_BTW
+        self.params = [self.engine.SPHERE_SIZE, self.engine.simulation,
+                       self.engine.DIST_BTW, self.engine.four_roots,
+                       self.engine.color_scheme]
+        self.radius = self.engine.radius
+        self.extra_distance = self.engine.extra_distance
+        self.checkpoint_path = path
+        self.resumed = True
+        self.choose_and_run()
 
     def choose_and_run(self):
-        # one sphere at (0, 0, 0)
-        if self.params[1] == 1:
-            self.sphere_list = [(0, 0, 0)]
+        # The engine has already placed the roots and picked their colors
+        # (or a checkpoint has filled it with a tree that is partly grown).
+        # Draw what is there, then start the task that adds spheres.
+        self.colors = [VBase4(*color) for color in self.engine.colors]
+        if self.batch_spheres:
+            self.spheres = SphereBatch(self.loader, render, self.SPHERE_SIZE,
+                                       self.directionalLight, self.ambientLight,
+                                       chunk_size = self.chunk_size)
+            self.engine.on_burn_out = self.spheres.retire
+            # Runs after the add_sphere tasks, so each frame's new spheres are
+            # combined once, before the frame is drawn.
+            self.taskMgr.add(self.collect_spheres, "collect_spheres", sort = 10)
+            self.taskMgr.doMethodLater(self.merge_every, self.merge_spheres,
+                                       "merge_spheres")
+        engine = self.engine
+        for i, sphere in enumerate(engine.sphere_list):
+            root = engine.sphere_roots[i]
+            # The fifth cerebellum root in the four point simulation isn't
+            # drawn.
+            if root >= engine.roots:
+                continue
+            self.load_sphere(sphere,
+                             self.directionalLight,
+                             self.ambientLight,
+                             self.colors[root],
+                             i)
+            if self.spheres is not None and i not in engine.frontiers[root]:
+                self.spheres.retire(i)
+        if self.log_path is not None:
+            self.log = GrowthLog(self.log_path, self.SPHERE_SIZE,
+                                 resume = self.resumed)
+            self.log.follow(engine)
+            atexit.register(self.log.close)
+            self.taskMgr.doMethodLater(1, self.flush_log, "flush_log")
+        self.taskMgr.add(self.grow, "grow")
+
+        self.accept("c", self.save_checkpoint)
+        self.accept("p", self.toggle_perf)
+        if self.perf_path is not None:
+            self.perf_log = PerfLog(self.perf_path)
+            self.toggle_perf()
+        if self.checkpoint_every:
+            self.taskMgr.doMethodLater(self.checkpoint_every,
+                                       self.checkpoint_task, "checkpoint")
+
+    # Walker mode. The engine has placed the roots and picked their colors;
+    # each root becomes a seed cell of the voxel grid and the walkers grow
+    # the aggregate from there. The tree only features (the log, checkpoints
+    # and the performance overlay) are left off.
+    def start_walkers(self):
+        engine = self.engine
+        self.colors = [VBase4(*color) for color in engine.colors]
+        if self.batch_spheres:
+            self.spheres = SphereBatch(self.loader, render, self.SPHERE_SIZE,
+                                       self.directionalLight, self.ambientLight,
+                                       chunk_size = self.chunk_size)
+            self.taskMgr.add(self.collect_spheres, "collect_spheres", sort = 10)
+            self.taskMgr.doMethodLater(self.merge_every, self.merge_spheres,
+                                       "merge_spheres")
+        # The roots are the first spheres, in order, so seed i grows root
+        # i. The fifth cerebellum root in the four point simulation isn't
+        # a seed.
+        seeds = [tuple(int(round(x/self.radius)) for x in sphere)
+                 for sphere in engine.sphere_list[:engine.roots]]
+        self.dla = VoxelDLA(seeds, self.grid_size, self.walker_count)
+        self.add_cells(self.dla.cells, self.dla.cell_seeds)
+        self.taskMgr.add(self.walk, "walk")
+
+    # Draws cells of the voxel grid. A cell never changes once it has stuck,
+    # so it goes straight on the list to be merged into its chunk.
+    def add_cells(self, cells, seeds):
+        start = len(self.spheres) if self.spheres is not None else 0
+        for i, (cell, seed) in enumerate(zip(cells, seeds)):
+            position = (cell[0]*self.radius, cell[1]*self.radius,
+                        cell[2]*self.radius)
+            self.load_sphere(position,
+                             self.directionalLight,
+                             self.ambientLight,
+                             self.colors[seed],
+                             start + i)
+            if self.spheres is not None:
+                self.spheres.retire(start + i)
+
+    # The walker task. Steps every walker until frame_budget milliseconds
+    # are used up, then lets the frame be drawn.
+    def walk(self, task):
+        dla = self.dla
+        deadline = time.perf_counter() + self.frame_budget/1000.0
+        while not dla.finished():
+            cells, seeds = dla.step()
+            self.add_cells(cells, seeds)
+            if time.perf_counter() >= deadline:
+                return Task.cont
+        # The aggregate has reached the edge of the grid.
+        return Task.done
 
-            self.outside_sphere_list0 = []
-            self.outside_sphere_list0.append(self.sphere_list[0])
-            self.counter_list0 = [0]
-            
-            if self.params[4] == 1:
-                COLOR = VBase4(0.4, 0.4, 0.4, 1)
-            # Choose random color
-            if self.params[4] == 2:
-                COLOR = random_color()
-            if self.params[4] == 3:
-                g = randint(0, 4)
-                COLOR = (
-                    [VBase4(1, 0, 0, 1),
-                     VBase4(0, 0.5, 0, 1),
-                     VBase4(0, 0, 1, 1),
-                     VBase4(1, 1, 0, 1),
-                     VBase4(1, 1, 1, 1)][g]
-                    )
-                
-        # Two spheres DIST_BTW apart if user selects "Two Spheres"
-        # Sets cerebellum to True if user selects "Cerebellum?"
-        elif self.params[1] == 2:
-            self.sphere_list = [(-self.DIST_BTW/2, 0, 0),
-                                (self.DIST_BTW/2, 0, 0)]
-
-            if self.params[4] == 1:
-                COLOR = [VBase4(0.4, 0.4, 0.4, 1), VBase4(0.6, 0.6, 0.6, 1)]
-            elif self.params[4] == 2:
-                COLOR = []
-                COLOR.append(random_color())
-                COLOR.append(random_color())
-            elif self.params[4] == 3:
-                COLOR = []
-                for i in range(2):
-                    g = randint(0, 4)
-                    COLOR.append(
-                        [VBase4(1, 0, 0, 1),
-                         VBase4(0, 0.5, 0, 1),
-                         VBase4(0, 0, 1, 1),
-                         VBase4(1, 1, 0, 1),
-                         VBase4(1, 1, 1, 1)][g]
-                        )
-                    
-            # Will need these local variable lists. They define which
-            # nodes are chosen each iteration to 'grow.'
-            # Will need one list for each time we want a new node
-            # (coudn't find a way around it).
-            self.outside_sphere_list0.append(self.sphere_list[0])
-            self.counter_list0 = [0]
-            self.outside_sphere_list1.append(self.sphere_list[1])
-            self.counter_list1 = [0]
-            
-        elif self.params[1] == 3:
-            self.sphere_list = [(-25, 0, 0), (25, 0, 0), (0, 0, 13), (0, 0, -17), (-25, 0, -17)]
-
-            # choose colors based on user input.
-            if self.params[4] == 1:
-                COLOR = [VBase4(float(i)/10, float(i)/10, float(i)/10, 1) for i in range(3, 8)]
-            elif self.params[4] == 2:
-                COLOR = [random_color() for i in range(5)]
-            elif self.params[4] == 3:
-                COLOR = [VBase4(1, 0, 0, 1),
-                         VBase4(0, 0.5, 0, 1),
-                         VBase4(0, 0, 1, 1),
-                         VBase4(1, 1, 0, 1),
-                         VBase4(1, 1, 1, 1)]
-
-            # Similar to if the user chooses two points, but more points obviously
-            self.outside_sphere_list0.append(self.sphere_list[0])
-            self.counter_list0 = [0]
-            self.outside_sphere_list1.append(self.sphere_list[1])
-            self.counter_list1 = [0]
-            self.outside_sphere_list2.append(self.sphere_list[2])
-            self.counter_list2 = [0]
-            self.outside_sphere_list3.append(self.sphere_list[3])
-            self.counter_list3 = [0]
-
-            if self.params[3] == False:
-                self.outside_sphere_list4 = []
-                self.outside_sphere_list4.append(self.sphere_list[4])
-                self.counter_list4 = [0]
-            
-        # task manager for drawing the spheres with add_sphere below
-        if self.params[1] == 1:
-            self.load_sphere(self.sphere_list[0], self.directionalLight,
-                             self.ambientLight, COLOR)
-            self.taskMgr.add(self.add_sphere, "add_sphere",
-                             extraArgs = [COLOR,
-                                          self.sphere_list[0],
-                                          self.outside_sphere_list0,
-                                          self.counter_list0],
-                             appendTask = True)
-
-        if self.params[1] == 2:
-            self.load_sphere(self.sphere_list[0], self.directionalLight,
-                             self.ambientLight, COLOR[0])
-            self.load_sphere(self.sphere_list[1], self.directionalLight,
-                             self.ambientLight, COLOR[1])            
-            self.taskMgr.add(self.add_sphere, "add_sphere",
-                             extraArgs = [COLOR[0],
-                                          self.sphere_list[0],
-                                          self.outside_sphere_list0,
-                                          self.counter_list0],
-                             appendTask = True)
-            self.taskMgr.add(self.add_sphere, "add_sphere",
-                             extraArgs = [COLOR[1],
-                                          self.sphere_list[1],
-                                          self.outside_sphere_list1,
-                                          self.counter_list1],
-                             appendTask = True)
-
-        # This is for all the spheres in the cerebellum simulation.
-        if self.params[1] == 3:
-            if self.params[3] == True:
-                four_or_five = 4
-            elif self.params[3] == False:
-                four_or_five = 5
-
-            for i in range(four_or_five):
-                self.load_sphere(self.sphere_list[i],
-                                 self.directionalLight,
-                                 self.ambientLight,
-                                 COLOR[i])
-
-            self.taskMgr.add(self.add_sphere, "add_sphere",
-                             extraArgs = [COLOR[0],
-                                          self.sphere_list[0],
-                                          self.outside_sphere_list0,
-                                          self.counter_list0],
-                             appendTask = True)
-            self.taskMgr.add(self.add_sphere, "add_sphere",
-                             extraArgs = [COLOR[1],
-                                          self.sphere_list[1],
-                                          self.outside_sphere_list1,
-                                          self.counter_list1],
-                             appendTask = True)
-            self.taskMgr.add(self.add_sphere, "add_sphere",
-                             extraArgs = [COLOR[2],
-                                          self.sphere_list[2],
-                                          self.outside_sphere_list2,
-                                          self.counter_list2],
-                             appendTask = True)
-            self.taskMgr.add(self.add_sphere, "add_sphere",
-                             extraArgs = [COLOR[3],
-                                          self.sphere_list[3],
-                                          self.outside_sphere_list3,
-                                          self.counter_list3],
-                             appendTask = True)
-            if self.params[3] == False:
-                self.taskMgr.add(self.add_sphere, "add_sphere",
-                                 extraArgs = [COLOR[4],
-                                              self.sphere_list[4],
-                                              self.outside_sphere_list4,
-                                              self.counter_list4],
-                                 appendTask = True)
-            
     # Loads a sphere. The inputs are self explanatory.
     # I set the directional and ambient light to class globals,
     # so it wouldn't creat a new light per sphere, which is possible
     # but apparently expensive.
+    # key is the sphere's id in the engine, so it can be merged into a chunk
+    # once it burns out.
     def load_sphere(self,
                     position,
                     directionalLight,
                     ambientLight,
-                    color):
-
-        # Load a sphere.
-        pos = position
-        self.sphere = self.loader.loadModel("ball")
-        self.sphere.setScale(self.SPHERE_SIZE,
-                             self.SPHERE_SIZE,
-                             self.SPHERE_SIZE)
-        self.sphere.setPos(pos)
-       
-        # Sets the sphere color.
-        self.sphere.setColor(color)
-        self.sphere.reparentTo(render)
-
-        # Make the sphere a material (to behave with the light).
-        material = Material()
-        material.setShininess(10.0)
-        self.sphere.setMaterial(material)
-                
-        # Set lighting on the sphere.
-        self.sphere.setLight(self.sphere.attachNewNode(directionalLight))
-        self.sphere.setLight(self.sphere.attachNewNode(ambientLight))
-
-    # Adds spheres to the scene.
-    def add_sphere(self, color, starting_node,
-                   outside_sphere_list, counter_list, task):
-        # select randomly from the list of spheres
-        n = randint(0, len(outside_sphere_list) - 1)
-        chosen_sphere = outside_sphere_list[n]
-        # select randomly from the list of possible vectors
-        n = randint(0, len(self.possible_vectors) - 1)
-        chosen_vector = self.possible_vectors[n]
-
-        # add the vectors together to get a new location
-        # for a sphere
-        x = chosen_sphere[0] + chosen_vector[0]
-        y = chosen_sphere[1] + chosen_vector[1]
-        z = chosen_sphere[2] + chosen_vector[2]
-
-        # calculates the distance from where the new sphere will randomly be
-        # drawn to the other spheres, removes reduntant numbers
-        d = []
-        f = []
-        distances = []
-        pop = list(self.sphere_list)
-        if len(pop) > 1:
-            pop.remove(chosen_sphere)
-        d = [(x, y, z) for i in range(len(pop))]
-        distances = [int(euclidean(d[i], pop[i]))  \
-                     for i in range(len(pop))]
-        distances = list(set(distances))
-
-        # Recalculate distances from the other spheres for the chosen_sphere.
-        # This method of culling spheres is a little inefficient. Perhaps in
-        # the future I could make it more efficient by just choosing spheres
-        # that are nearby. I'm not sure yet how to accomplish this.
-        d = []
-        chosen_distances = []
-        d = [chosen_sphere for i in range(len(pop))]
-        chosen_distances = [int(euclidean(d[i], pop[i])) for i in range(len(pop))]
-        chosen_distances = list(set(chosen_distances))
-        # Sorts the chosen_distances lowest to highest.
-        chosen_distances.sort()
-        
-        # temp will be used to index the counter of chosen_sphere.
-        temp = outside_sphere_list.index(chosen_sphere)
-
-        # Make the new sphere list and render the sphere.
-        # First if statement only allows the render if the sphere
-        # is going to be a certain distance away from all the other spheres,
-        # in this case a 'radius' distance away.
-        if min(distances) >= int(self.radius):
-            if counter_list[temp] <= 1:
-                if len(chosen_distances) <= 5:
-
-                    outside_sphere_list.append((x, y, z))
-                    self.sphere_list.append((x, y, z))
-                    counter_list.append(0)
-                    # The chosen_sphere counter goes up by one.
-                    counter_list[temp] += 1
-
-                    # Render sphere.
-                    self.load_sphere((x, y, z),
-                                     self.directionalLight,
-                                     self.ambientLight,
-                                     color)
-
-                if len(chosen_distances) > 5 \
-                   and chosen_distances[5] >= int(self.radius) \
-                   + self.extra_distance:
-                    
-                    outside_sphere_list.append((x, y, z))
-                    self.sphere_list.append((x, y, z))
-                    counter_list.append(0)
-                    # The chosen_sphere counter goes up by one.
-                    counter_list[temp] += 1
-
-                    # draw sphere
-                    self.load_sphere((x, y, z),
-                                     self.directionalLight,
-                                     self.ambientLight,
-                                     color)
-
-            # The only available spheres for selection are the outside
-            # ones in sphere_list. They 'burn out' after the number chosen
-            # in the if statement.
-            if counter_list[temp] > 1:
-                outside_sphere_list.remove(chosen_sphere)
-                del counter_list[temp]
-                
+                    color,
+                    key = None):
+
+        if self.spheres is not None:
+            # The batch already has the lights and material.
+            self.sphere = self.spheres.add(position, color, key)
+        else:
+            self.sphere = load_single_sphere(self.loader, render, position,
+                                             self.SPHERE_SIZE, color,
+                                             directionalLight, ambientLight)
+
+    def collect_spheres(self, task):
+        self.spheres.collect()
         return Task.cont
 
-Cerebellum = main()
-Cerebellum.run()
+    def merge_spheres(self, task):
+        self.spheres.merge(self.merge_chunks)
+        return Task.again
+
+    # Writes the whole tree to checkpoint_path. It happens between frames, so
+    # never in the middle of a growth attempt.
+    def save_checkpoint(self):
+        start = time.perf_counter()
+        # The log has to be on disk as far as the checkpoint goes.
+        if self.log is not None:
+            self.log.flush()
+        save_checkpoint(self.engine, self.checkpoint_path)
+        print("checkpoint of %d spheres written to %s in %.2f s"
+              % (len(self.engine.sphere_list), self.checkpoint_path,
+                 time.perf_counter() - start))
+
+    # Turns the performance overlay on or off. While it is off nothing is
+    # measured at all.
+    def toggle_perf(self):
+        if self.perf is None:
+            self.perf = GrowthStats()
+            self.perf.attach(self.engine)
+            self.perf.wrap(self, "load_sphere", timer="load_sphere")
+            self.perf_text = OnscreenText(text = "", parent = base.a2dTopLeft,
+                                          pos = (0.05, -0.08), scale = 0.045,
+                                          align = TextNode.ALeft,
+                                          mayChange = True)
+            self.taskMgr.doMethodLater(1, self.perf_task, "perf")
+        else:
+            self.taskMgr.remove("perf")
+            self.perf.unwrap()
+            self.perf = None
+            self.perf_text.destroy()
+            self.perf_text = None
+
+    def perf_task(self, task):
+        fps = globalClock.getAverageFrameRate()
+        row = self.perf.sample({"nodes": render.countNumDescendants(),
+                                "fps": round(fps, 1)})
+        self.perf_text.setText("\n".join(describe(row)))
+        if self.perf_log is not None:
+            self.perf_log.write(row)
+        return Task.again
+
+    def flush_log(self, task):
+        self.log.flush()
+        return Task.again
+
+    def checkpoint_task(self, task):
+        self.save_checkpoint()
+        if self.engine.finished():
+            return Task.done
+        return Task.again
+
+    # Adds spheres to the scene. Each call is one try (or grow_batch tries)
+    # at growing the tree from the given root; the engine decides if a sphere
+    # can go there.
+    def add_sphere(self, root):
+        if self.grow_batch > 1:
+            new_spheres = self.engine.attempt_batch(root, self.grow_batch)
+        else:
+            new_sphere = self.engine.attempt(root)
+            new_spheres = [] if new_sphere is None else [new_sphere]
+
+        first = len(self.engine.sphere_list) - len(new_spheres)
+        for i, new_sphere in enumerate(new_spheres):
+            # Render sphere.
+            self.load_sphere(new_sphere,
+                             self.directionalLight,
+                             self.ambientLight,
+                             self.colors[root],
+                             first + i)
+
+    # The growth task. Keeps trying to add spheres until frame_budget
+    # milliseconds are used up, then lets the frame be drawn.
+    def grow(self, task):
+        engine = self.engine
+        deadline = time.perf_counter() + self.frame_budget/1000.0
+        roots = range(engine.roots)
+        while not engine.finished():
+            if self.weight_roots:
+                sizes = [len(frontier) for frontier in engine.frontiers]
+                self.add_sphere(self.pick_root.choices(roots, sizes)[0])
+            else:
+                for root in roots:
+                    self.add_sphere(root)
+            if time.perf_counter() >= deadline:
+                return Task.cont
+        # Every root has burned out.
+        return Task.done
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grow a 3D Brownian tree.")
+    parser.add_argument("resume", nargs="?", default=None,
+                        help="checkpoint to carry on growing from")
+    parser.add_argument("--log", default=None, metavar="FILE",
+                        help="write every sphere to this growth log as it grows")
+    parser.add_argument("--perf", default=None, metavar="FILE",
+                        help="start with the performance overlay on and write "
+                        "its numbers to this .csv or .jsonl file")
+    parser.add_argument("--walkers", action="store_true",
+                        help="grow with random walkers on a voxel grid instead")
+    args = parser.parse_args()
+    Cerebellum = main(args.resume, args.log, args.perf, args.walkers)
+    Cerebellum.run()
@@ -0,0 +1,448 @@
+"""
+Grows the roots of one 3D Brownian tree side by side, one worker process per
+root, for the cerebellum simulation's four or five roots (or the two point
+one's two):
+
+    python parallel_roots.py --simulation cerebellum --five --spheres 100000 -o tree.npz
+
+The roots only meet through the overlap and crowding checks, but they do
+meet, so they can't simply be grown as separate trees. Here they grow in
+rounds, and every worker only does the work of its own root:
+
+    propose: the worker draws --batch tries for its root the way
+    GrowthEngine.attempt_batch() does and measures them against the tree as
+    it was at the start of the round. The tries that aren't blocked go into
+    shared memory.
+
+    resolve: the worker drops its tries that come near any other root's
+    tries of the round: a new sphere closer than int(radius) to one of them,
+    or a chosen sphere close enough to one to be crowded by it. What is left
+    can't be touched by anything the other roots grow this round, so the
+    worker goes through it in order by itself with the usual checks (the
+    chosen sphere hasn't burned out, the new sphere is clear of the ones
+    this root already added this round, the chosen sphere isn't crowded)
+    and puts the tries it accepts into shared memory.
+
+    apply: every worker adds every root's accepted spheres to its tree, in
+    the same order, so they all give the spheres the same ids. Only its own
+    spheres get the full treatment (crowding bits, frontier, open
+    directions, see GrowthEngine.add and block); another root's sphere is
+    just filed in the spatial hash, unless it is near one of the worker's
+    own spheres, where it can change their crowding bits or open directions.
+
+So the tree keeps to the usual rules, and since every step only depends on
+the tries, it only depends on the seed, not on which worker got there first.
+The tries dropped in resolve only cost a little growth where two roots meet.
+The positions and roots of the spheres are written into a table in shared
+memory by the worker that grew them, for this process to collect at the end.
+
+Each root draws its tries from its own random numbers, so the trees are not
+the ones growth_engine.py grows from the same seed, but --serial grows the
+very same tree as the workers do, one root after another in a single
+process, to check against. Either way the CPU time each root took is
+printed: the busiest root's time is about as quick as the workers can be on
+a machine with a core for each of them.
+"""
+from multiprocessing import Barrier, Process, shared_memory
+import argparse
+import time
+
+import numpy as np
+
+from growth_engine import GrowthEngine
+
+# What every root reports in shared memory (see SharedTree.status): the
+# attempts it has made, its frontier's size and the spheres it has grown
+# after the last round, and the CPU time it took, in microseconds.
+ATTEMPTS, FRONTIER, GROWN, CPU = 0, 1, 2, 3
+
+
+# Whole number distances from every point in a to every point in b, as a
+# len(a) x len(b) array. The same sums as GrowthEngine.int_distances().
+def pairwise_int_distances(a, b):
+    d = a[:, None, :] - b[None, :, :]
+    return np.sqrt(d[:, :, 0]*d[:, :, 0]
+                   + d[:, :, 1]*d[:, :, 1]
+                   + d[:, :, 2]*d[:, :, 2]).astype(np.int64)
+
+
+def make_engine(params, seed):
+    sphere_size, simulation, dist_btw, four_roots, color_scheme = params
+    return GrowthEngine(sphere_size=sphere_size, simulation=simulation,
+                        dist_btw=dist_btw, four_roots=four_roots,
+                        color_scheme=color_scheme, seed=seed)
+
+
+# The shared memory: the sphere table, the root of each sphere, every root's
+# tries and accepted tries for the round, and what every root reports.
+class SharedTree:
+
+    def __init__(self, capacity, roots, batch_size, name=None):
+        self.batch_size = batch_size
+        self.shapes = [("positions", np.float64, (capacity, 3)),
+                       ("roots", np.int8, (capacity,)),
+                       ("tries", np.int64, (roots, 2, 1 + batch_size)),
+                       ("accepted", np.int64, (roots, 2, 1 + batch_size)),
+                       ("status", np.int64, (roots, 4))]
+        size = sum(np.dtype(dtype).itemsize*int(np.prod(shape))
+                   for field, dtype, shape in self.shapes)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        offset = 0
+        for field, dtype, shape in self.shapes:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf,
+                               offset=offset)
+            setattr(self, field, array)
+            offset += array.nbytes
+
+    # Writes one root's sphere ids and vector indices into its row of table
+    # (tries or accepted).
+    @staticmethod
+    def publish(table, root, parents, vectors):
+        for part, values in zip(table[root], (parents, vectors)):
+            part[0] = len(values)
+            part[1:1 + len(values)] = values
+
+    # Every root's sphere ids and vector indices back from table.
+    @staticmethod
+    def read(table):
+        return [tuple(part[1:1 + part[0]].tolist() for part in row)
+                for row in table]
+
+    def close(self):
+        for field, dtype, shape in self.shapes:
+            delattr(self, field)
+        self.memory.close()
+
+
+class RootGrower:
+    """
+    Grows one root of the tree through a SharedTree, in a worker process or,
+    for --serial, next to the others in this one. Its engine has every
+    sphere of the tree in it, but only its own root's frontier, open
+    directions and crowding bits are kept up to date.
+    """
+
+    def __init__(self, params, seed, root, shared):
+        self.engine = make_engine(params, seed)
+        self.root = root
+        self.shared = shared
+        self.rng = np.random.default_rng([seed, root])
+        engine = self.engine
+        # A sphere further than this from another can't change its crowding
+        # bits or block one of its directions.
+        self.cell = max(int(engine.radius) + engine.extra_distance,
+                        engine.block_reach)
+        # The cells (self.cell on a side) next to or with one of this
+        # root's spheres in them. A sphere that is not in one of them is
+        # too far from all of this root's spheres to matter to them.
+        self.near = set()
+        for sphere, owner in zip(engine.sphere_list, engine.sphere_roots):
+            if owner == root:
+                self.mark(sphere)
+        # This round's tries that aren't blocked: the chosen sphere ids and
+        # the indices into possible_vectors.
+        self.parents = []
+        self.vectors = []
+        self.grown = 0
+        self.cpu = 0.0
+
+    def cell_of(self, sphere):
+        cell = self.cell
+        return (int(sphere[0]//cell), int(sphere[1]//cell), int(sphere[2]//cell))
+
+    # Marks the cells round one of this root's spheres as near.
+    def mark(self, sphere):
+        i, j, k = self.cell_of(sphere)
+        self.near.update((i + di, j + dj, k + dk)
+                         for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                         for dk in (-1, 0, 1))
+
+    # Runs one of the steps below, adding the CPU time it takes to self.cpu.
+    def timed(self, step):
+        start = time.process_time()
+        step()
+        self.cpu += time.process_time() - start
+
+    # The round's tries: batch_size (sphere, vector) pairs drawn the way
+    # attempt_batch() draws them, keeping the ones that aren't blocked by
+    # the tree as it is. Boxed in spheres are retired.
+    def propose(self):
+        engine = self.engine
+        frontier = engine.frontiers[self.root]
+        self.parents = []
+        self.vectors = []
+        if frontier:
+            k = self.shared.batch_size
+            picks = self.rng.integers(0, len(frontier), k).tolist()
+            draws = self.rng.integers(0, len(engine.possible_vectors), k).tolist()
+            boxed_in = set()
+            chosen = []
+            vector_picks = []
+            for pick, j in zip(picks, draws):
+                parent = frontier.ids[pick]
+                directions = engine.open_directions(parent)
+                if not directions:
+                    boxed_in.add(parent)
+                elif j < len(directions):
+                    chosen.append(parent)
+                    vector_picks.append(directions[j])
+            for parent in sorted(boxed_in):
+                engine.retire(self.root, parent)
+            # Counted the way attempt_batch() counts them.
+            engine.attempts += len(chosen) + len(boxed_in)
+            if chosen:
+                chosen = np.array(chosen, dtype=np.int64)
+                vector_picks = np.array(vector_picks, dtype=np.int64)
+                clear = ~engine.blocked_tries(chosen, vector_picks)
+                self.parents = chosen[clear].tolist()
+                self.vectors = vector_picks[clear].tolist()
+        self.shared.publish(self.shared.tries, self.root, self.parents,
+                            self.vectors)
+
+    # Picks the tries to grow out of this root's tries for the round, now
+    # that every root's are in shared memory.
+    def resolve(self):
+        engine = self.engine
+        root = self.root
+        frontier = engine.frontiers[root]
+        reach = int(engine.radius)
+        crowd_reach = int(engine.radius) + engine.extra_distance
+        parents = []
+        vectors = []
+        if self.parents:
+            centers = engine.positions[self.parents]
+            candidates = centers + engine.vector_array[self.vectors]
+            others = [engine.positions[other_parents]
+                      + engine.vector_array[other_vectors]
+                      for other, (other_parents, other_vectors)
+                      in enumerate(self.shared.read(self.shared.tries))
+                      if other != root and other_parents]
+            keep = np.ones(len(self.parents), dtype=bool)
+            if others:
+                # Anything another root grows this round is one of these.
+                others = np.concatenate(others)
+                keep &= ~(pairwise_int_distances(candidates, others) < reach).any(axis=1)
+                keep &= ~(pairwise_int_distances(centers, others) < crowd_reach).any(axis=1)
+            # The spheres added so far this round.
+            added = np.zeros((len(self.parents), 3))
+            count = 0
+            for i in np.flatnonzero(keep).tolist():
+                parent = self.parents[i]
+                # An earlier try in this round may have burned it out.
+                if parent not in frontier:
+                    continue
+                if count and (engine.int_distances(
+                        added[:count], candidates[i:i + 1]) < reach).any():
+                    continue
+                # crowded(), with the spheres added this round counted too.
+                bits = engine.crowding[parent]
+                if count:
+                    distances = engine.int_distances(added[:count],
+                                                     centers[i:i + 1])
+                    for d in distances[distances < crowd_reach].tolist():
+                        bits |= 1 << d
+                if bin(bits).count("1") > 5:
+                    engine.retire(root, parent)
+                    continue
+                added[count] = candidates[i]
+                count += 1
+                parents.append(parent)
+                vectors.append(self.vectors[i])
+                if frontier.add_child(parent) > 1:
+                    engine.retire(root, parent)
+        self.grown += len(parents)
+        self.shared.publish(self.shared.accepted, root, parents, vectors)
+        self.shared.status[root, :CPU] = (engine.attempts,
+                                          len(frontier) + len(parents),
+                                          self.grown)
+
+    # Adds every root's accepted spheres to the tree, root by root.
+    def apply(self):
+        engine = self.engine
+        shared = self.shared
+        for root, (parents, vectors) in enumerate(shared.read(shared.accepted)):
+            mine = root == self.root
+            for parent, j in zip(parents, vectors):
+                chosen_sphere = engine.sphere_list[parent]
+                vector = engine.possible_vectors[j]
+                new_sphere = (chosen_sphere[0] + vector[0],
+                              chosen_sphere[1] + vector[1],
+                              chosen_sphere[2] + vector[2])
+                near = mine or self.cell_of(new_sphere) in self.near
+                new = engine.add(new_sphere, root, neighbors=near)
+                if mine:
+                    engine.frontiers[root].add(new)
+                    self.mark(new_sphere)
+                    shared.positions[new] = new_sphere
+                    shared.roots[new] = root
+                if near:
+                    engine.block(new)
+
+    # True when the tree is done growing, which every grower works out the
+    # same after apply().
+    def done(self, max_spheres, max_attempts):
+        status = self.shared.status
+        return (not status[:, FRONTIER].any()
+                or len(self.engine.sphere_list) >= max_spheres
+                or (max_attempts is not None
+                    and status[:, ATTEMPTS].sum() >= max_attempts))
+
+    # One round, all three steps, for the growers one after another.
+    @staticmethod
+    def round(growers):
+        for step in ("propose", "resolve", "apply"):
+            for grower in growers:
+                grower.timed(getattr(grower, step))
+
+    def report_cpu(self):
+        self.shared.status[self.root, CPU] = int(self.cpu*1e6)
+
+
+# A SharedTree for a run, with the spheres the engine starts with in it, and
+# the engine.
+def start(params, seed, max_spheres, batch_size):
+    engine = make_engine(params, seed)
+    roots = engine.roots
+    n = len(engine.sphere_list)
+    capacity = max_spheres + roots*batch_size + n + 1
+    shared = SharedTree(capacity, roots, batch_size)
+    shared.positions[:n] = engine.positions[:n]
+    shared.roots[:n] = engine.sphere_roots
+    shared.status[:] = 0
+    shared.status[:, FRONTIER] = [len(frontier) for frontier in engine.frontiers]
+    return engine, shared
+
+
+# Fills the engine from start() in with the finished tree (its frontiers are
+# the starting ones; it is for saving, not for growing on). Returns the CPU
+# time every root took, in seconds.
+def collect(engine, shared):
+    n = len(engine.sphere_list) + int(shared.status[:, GROWN].sum())
+    engine.positions = shared.positions[:n].copy()
+    engine.sphere_list = list(zip(*engine.positions.T.tolist()))
+    engine.sphere_roots = shared.roots[:n].tolist()
+    engine.attempts = int(shared.status[:, ATTEMPTS].sum())
+    return (shared.status[:, CPU]/1e6).tolist()
+
+
+# The same rounds as the workers make, in this process. Returns the engine
+# and the CPU time every root took.
+def grow_serial(params, seed, max_spheres, max_attempts=None, batch_size=64):
+    engine, shared = start(params, seed, max_spheres, batch_size)
+    try:
+        growers = [RootGrower(params, seed, root, shared)
+                   for root in range(engine.roots)]
+        while not growers[0].done(max_spheres, max_attempts):
+            RootGrower.round(growers)
+        for grower in growers:
+            grower.report_cpu()
+        cpu = collect(engine, shared)
+    finally:
+        shared.close()
+        shared.memory.unlink()
+    return engine, cpu
+
+
+def _worker(root, name, capacity, roots, params, seed, limits, barrier):
+    max_spheres, max_attempts, batch_size = limits
+    shared = SharedTree(capacity, roots, batch_size, name)
+    try:
+        grower = RootGrower(params, seed, root, shared)
+        while not grower.done(max_spheres, max_attempts):
+            grower.timed(grower.propose)
+            barrier.wait()
+            grower.timed(grower.resolve)
+            barrier.wait()
+            # Nobody writes the next round's tries before everyone has read
+            # these, or accepted tries before everyone has applied these:
+            # both need everyone past the first wait of the next round.
+            grower.timed(grower.apply)
+        grower.report_cpu()
+    except BaseException:
+        # The others would wait for this one forever.
+        barrier.abort()
+        raise
+    finally:
+        shared.close()
+
+
+# Grows the tree with one worker process per root. Returns the engine and
+# the CPU time every root took.
+def grow_parallel(params, seed, max_spheres, max_attempts=None, batch_size=64):
+    engine, shared = start(params, seed, max_spheres, batch_size)
+    try:
+        roots = engine.roots
+        barrier = Barrier(roots)
+        workers = [Process(target=_worker,
+                           args=(root, shared.memory.name,
+                                 len(shared.roots), roots, params, seed,
+                                 (max_spheres, max_attempts, batch_size),
+                                 barrier))
+                   for root in range(roots)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if any(worker.exitcode for worker in workers):
+            raise RuntimeError("a worker process failed")
+        cpu = collect(engine, shared)
+    finally:
+        shared.close()
+        shared.memory.unlink()
+    return engine, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Grow the roots of a 3D Brownian tree in parallel, one "
+        "process per root.")
+    parser.add_argument("--size", type=int, default=5,
+                        help="sphere size (default 5)")
+    parser.add_argument("--simulation", choices=["two", "cerebellum"],
+                        default="cerebellum",
+                        help="two points or the cerebellum simulation "
+                        "(default cerebellum)")
+    parser.add_argument("--distance", type=int, default=35,
+                        help="how far apart the two points are (default 35)")
+    parser.add_argument("--five", action="store_true",
+                        help="five roots in the cerebellum simulation instead of four")
+    parser.add_argument("--colors", choices=["gray", "random", "rgby"],
+                        default="gray", help="color scheme (default gray)")
+    parser.add_argument("--spheres", type=int, default=10000,
+                        help="stop once the tree has this many spheres (default 10000)")
+    parser.add_argument("--attempts", type=int, default=None,
+                        help="stop after this many growth attempts")
+    parser.add_argument("--batch", type=int, default=64,
+                        help="tries per root per round (default 64)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed (default 0)")
+    parser.add_argument("--serial", action="store_true",
+                        help="grow the same tree in this process instead")
+    parser.add_argument("-o", "--output", default="tree.npz",
+                        help="where to write the tree (default tree.npz)")
+    args = parser.parse_args()
+
+    params = (args.size, ["one", "two", "cerebellum"].index(args.simulation) + 1,
+              args.distance, not args.five,
+              ["gray", "random", "rgby"].index(args.colors) + 1)
+    grow = grow_serial if args.serial else grow_parallel
+    start_time = time.perf_counter()
+    engine, cpu = grow(params, args.seed, args.spheres, args.attempts, args.batch)
+    elapsed = time.perf_counter() - start_time
+    engine.save(args.output)
+
+    print("%d spheres from %d attempts in %.2f s (%.0f spheres/s, %s), "
+          "written to %s"
+          % (len(engine.sphere_list), engine.attempts, elapsed,
+             len(engine.sphere_list)/max(elapsed, 1e-9),
+             "1 process" if args.serial else "%d processes" % engine.roots,
+             args.output))
+    print("CPU time per root: %s s, %.2f s in all, %.2f s for the busiest"
+          % (", ".join("%.2f" % seconds for seconds in cpu), sum(cpu), max(cpu)))
+
+
+if __name__ == "__main__":
+    main()
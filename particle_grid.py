@@ -0,0 +1,56 @@
+"""
+Free particle sprites of the 2D scripts sorted into a grid of square cells,
+so a particle can find out if it overlaps another one by looking at the few
+particles in the cells around it.
+
+pygame.sprite.spritecollideany(particle, freeParticles) checks the particle
+against every other free particle, so a tick over all of them is quadratic
+in their number. With cells at least as big as the particles, two particles
+that overlap are always in the same cell or in cells next to each other, so
+collideany() only has nine cells to look in.
+"""
+
+
+class ParticleGrid:
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        # (cell x, cell y) -> the particles in that cell
+        self.cells = {}
+
+    def __len__(self):
+        return sum(len(particles) for particles in self.cells.values())
+
+    def _cell(self, rect):
+        return (rect.left//self.cell_size, rect.top//self.cell_size)
+
+    def add(self, particle):
+        particle.cell = self._cell(particle.rect)
+        self.cells.setdefault(particle.cell, []).append(particle)
+
+    def remove(self, particle):
+        particles = self.cells[particle.cell]
+        particles.remove(particle)
+        if not particles:
+            del self.cells[particle.cell]
+
+    # Call after the particle's rect has moved.
+    def move(self, particle):
+        if self._cell(particle.rect) != particle.cell:
+            self.remove(particle)
+            self.add(particle)
+
+    # Another particle that overlaps this one, or None.
+    def collideany(self, particle):
+        rect = particle.rect
+        cx, cy = particle.cell
+        cells = self.cells
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                for other in cells.get((x, y), ()):
+                    if other is not particle and rect.colliderect(other.rect):
+                        return other
+        return None
+
+    def clear(self):
+        self.cells = {}
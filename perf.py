@@ -0,0 +1,236 @@
+"""
+Counters and timers for finding out where the time goes, in the 3D viewer
+(main.py) and in the 2D pygame scripts.
+
+Nothing here is built into the code being measured. Turning it on replaces a
+few methods on the objects being watched with wrappers that count and time
+the calls, and turning it off puts the originals back, so when it is off
+there is no cost at all, not even an if statement.
+
+GrowthStats watches a GrowthEngine: attempts, accepted spheres, why the
+others were turned down, and the time spent in the distance scans. Stats.wrap
+times anything else, like main.load_sphere or a sprite group's update.
+sample() sums up what happened since the last sample, as rates per second,
+and PerfLog writes the samples out as CSV or JSON Lines.
+"""
+import csv
+import json
+import time
+
+
+class Stats:
+
+    def __init__(self):
+        self.counts = {}
+        self.seconds = {}
+        # (object, method name) of every method that has been wrapped.
+        self.wrapped = []
+        self.last_counts = {}
+        self.last_time = time.perf_counter()
+        self.started = self.last_time
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    # Replaces obj.name with a wrapper that counts the calls under counter
+    # and adds the time they take to timer (either can be None).
+    def wrap(self, obj, name, counter=None, timer=None):
+        method = getattr(obj, name)
+        clock = time.perf_counter
+        stats = self
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            result = method(*args, **kwargs)
+            if timer is not None:
+                stats.add_time(timer, clock() - start)
+            if counter is not None:
+                stats.count(counter)
+            return result
+
+        setattr(obj, name, wrapper)
+        self.wrapped.append((obj, name))
+
+    # Puts the original methods back.
+    def unwrap(self):
+        for obj, name in reversed(self.wrapped):
+            # The wrapper was set on the instance, so deleting it uncovers
+            # the class's method again.
+            delattr(obj, name)
+        self.wrapped = []
+
+    # What happened since the last sample: every count as a rate per
+    # second, the share of the time spent in every timer, and the values of
+    # gauges (a dict of name -> number) as they are now.
+    def sample(self, gauges=None):
+        now = time.perf_counter()
+        elapsed = max(now - self.last_time, 1e-9)
+        row = {"time": round(now - self.started, 3)}
+        for name, value in sorted(self.counts.items()):
+            row[name] = value
+            row[name + "_per_s"] = (value - self.last_counts.get(name, 0))/elapsed
+        for name, value in sorted(self.seconds.items()):
+            row[name + "_ms"] = value*1000
+            row[name + "_share"] = (value - self.last_counts.get(name + "_s", 0.0))/elapsed
+            self.last_counts[name + "_s"] = value
+        if gauges:
+            row.update(gauges)
+        for name, value in self.counts.items():
+            self.last_counts[name] = value
+        self.last_time = now
+        return row
+
+
+class GrowthStats(Stats):
+    """
+    Watches a GrowthEngine. Every single attempt() is counted as accepted or
+    turned down for overlap (too close to another sphere), crowding (the
+    chosen sphere has too many neighbors) or blocked (every direction of the
+    chosen sphere is blocked). attempt_batch() tries are counted too, but
+    the batch doesn't say why each one failed, so those go under batch.
+    burn_out counts the spheres that leave the frontier for good, whether
+    for their second child, for crowding or for being boxed in; a sphere
+    with two children is retired right away, so it is never picked again to
+    be turned down for it.
+    """
+
+    def attach(self, engine):
+        self.engine = engine
+        original = engine.nearby_distances
+        clock = time.perf_counter
+        stats = self
+        # The distances from the last scan of the attempt being made, around
+        # the new point, and what crowded() said about the chosen sphere.
+        scans = []
+        crowding = []
+
+        def nearby_distances(center, reach, chosen, skip_chosen):
+            start = clock()
+            distances = original(center, reach, chosen, skip_chosen)
+            stats.add_time("distance_scan", clock() - start)
+            scans.append(distances)
+            return distances
+
+        original_crowded = engine.crowded
+
+        def crowded(sphere):
+            result = original_crowded(sphere)
+            crowding.append(result)
+            return result
+
+        attempt = engine.attempt
+
+        def attempted(root):
+            del scans[:]
+            del crowding[:]
+            if not engine.frontiers[root]:
+                return attempt(root)
+            new_sphere = attempt(root)
+            stats.count("attempts")
+            if new_sphere is not None:
+                stats.count("accepts")
+            elif not scans:
+                stats.count("blocked")
+            elif scans[0]:
+                stats.count("overlap")
+            elif any(crowding):
+                stats.count("crowding")
+            return new_sphere
+
+        attempt_batch = engine.attempt_batch
+
+        def attempted_batch(root, k):
+            # A batch on a lone sphere is passed on to attempt(), which
+            # counts itself.
+            before = engine.attempts - stats.counts["attempts"]
+            accepted = stats.counts["accepts"]
+            new_spheres = attempt_batch(root, k)
+            made = engine.attempts - stats.counts["attempts"] - before
+            accepted = len(new_spheres) - (stats.counts["accepts"] - accepted)
+            stats.count("attempts", made)
+            stats.count("accepts", accepted)
+            stats.count("batch", made - accepted)
+            return new_spheres
+
+        engine.nearby_distances = nearby_distances
+        engine.crowded = crowded
+        engine.attempt = attempted
+        engine.attempt_batch = attempted_batch
+        self.wrapped.extend([(engine, "nearby_distances"), (engine, "crowded"),
+                             (engine, "attempt"), (engine, "attempt_batch")])
+        # The distance work of attempt_batch(). Not int_distances() on its
+        # own, which add() also uses to keep the crowding bits up to date.
+        self.wrap(engine, "blocked_tries", timer="distance_scan")
+        self.wrap(engine, "retire", counter="burn_out")
+        for name in ("attempts", "accepts", "overlap", "crowding", "blocked",
+                     "burn_out", "batch"):
+            self.counts.setdefault(name, 0)
+        self.seconds.setdefault("distance_scan", 0.0)
+
+    # A sample with the size of the tree and its frontiers added.
+    def sample(self, gauges=None):
+        engine = self.engine
+        row = {"spheres": len(engine.sphere_list),
+               "frontier": sum(len(frontier) for frontier in engine.frontiers)}
+        if gauges:
+            row.update(gauges)
+        return Stats.sample(self, row)
+
+
+# Short text for an overlay or a window caption, from a sample.
+def describe(row):
+    parts = []
+    for name, value in row.items():
+        if name == "time" or name.endswith("_ms"):
+            continue
+        if name.endswith("_share"):
+            parts.append("%s %.0f%%" % (name[:-6], value*100))
+        elif name.endswith("_per_s"):
+            parts.append("%s/s %.0f" % (name[:-6], value))
+        elif name + "_per_s" not in row:
+            parts.append("%s %s" % (name, value))
+    return parts
+
+
+class PerfLog:
+    """
+    Writes samples to path, as CSV if it ends in .csv and as JSON Lines (one
+    JSON object per sample, a line each) otherwise. Every sample is added to
+    the end of the file and flushed, so the file is always complete and a
+    sample costs the same however long the run has gone on.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fields = None
+        self.writer = None
+        self.file = open(path, "w", newline="")
+
+    def write(self, row):
+        if self.path.endswith(".csv"):
+            if self.fields is None or any(name not in self.fields for name in row):
+                # New columns (or the first row): start the file again with
+                # them all. That only happens while the counters first turn
+                # up, so reading back the rows so far is cheap.
+                fields = list(self.fields or [])
+                fields.extend(name for name in row if name not in fields)
+                rows = []
+                if self.fields is not None:
+                    self.file.close()
+                    with open(self.path, newline="") as f:
+                        rows = list(csv.DictReader(f))
+                    self.file = open(self.path, "w", newline="")
+                self.fields = fields
+                self.writer = csv.DictWriter(self.file, self.fields)
+                self.writer.writeheader()
+                self.writer.writerows(rows)
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
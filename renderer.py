@@ -0,0 +1,119 @@
+"""
+Draws the 2D pygame scripts' window from NumPy arrays, for the swarm (see
+swarm.py).
+
+Drawing every particle with two surface.fill calls (rub it out, draw it
+again) every tick, and flipping the whole display every time round the main
+loop, costs more than moving the particles once there are a lot of them. The
+Renderer builds the whole picture in one NumPy array instead: the background,
+the tree from its TreeBitmap, then the free particles where the swarm has
+them, once a frame however many simulation steps there were in between, and
+copies only the 32x32 pixel tiles that changed to the window, unless so much
+has changed that copying all of it is quicker.
+"""
+import numpy as np
+import pygame
+
+TILE = 32
+
+
+class Renderer:
+    """
+    screen - the window's surface
+    tree - the TreeBitmap to draw
+    tree_color, particle_color - colors of the tree and of the free particles
+    background - a surface the size of the screen drawn under everything
+                 (black if None)
+    """
+
+    def __init__(self, screen, tree, tree_color, particle_color,
+                 background=None):
+        self.screen = screen
+        self.tree = tree
+        self.width, self.height = screen.get_size()
+        self.tree_color = screen.map_rgb(tree_color)
+        self.particle_color = screen.map_rgb(particle_color)
+        self.set_background(background)
+        self.frame = self.background.copy()
+        # What is in the window now, to find what changed. None makes the
+        # next frame copy everything.
+        self.shown = None
+        # Copy the whole frame when more than this share of the tiles
+        # changed.
+        self.full_share = 0.5
+
+    def set_background(self, background):
+        if background is None:
+            self.background = np.full((self.width, self.height),
+                                      self.screen.map_rgb((0, 0, 0)),
+                                      dtype=np.uint32)
+        else:
+            self.background = pygame.surfarray.array2d(
+                background.convert(self.screen)).astype(np.uint32)
+        self.shown = None
+
+    # Just flips the display, for the sprites, which draw themselves.
+    def flip(self):
+        pygame.display.flip()
+
+    # The frame for the swarm as it is now.
+    def compose(self, swarm):
+        frame = self.frame
+        np.copyto(frame, self.background)
+        np.copyto(frame, self.tree_color, where=self.tree.window())
+        frame[swarm.pixels(swarm.x, swarm.y)] = self.particle_color
+        return frame
+
+    # The background and the tree, without the free particles, on a new
+    # surface.
+    def tree_surface(self):
+        surface = self.screen.copy()
+        pixels = pygame.surfarray.pixels2d(surface)
+        pixels[...] = self.background
+        np.copyto(pixels, self.tree_color, where=self.tree.window())
+        del pixels
+        return surface
+
+    # Draws the swarm and the tree and updates the window. Returns the
+    # number of tiles copied.
+    def draw(self, swarm):
+        frame = self.compose(swarm)
+        if self.shown is None:
+            tiles = None
+        else:
+            tiles = self.changed_tiles(frame != self.shown)
+        pixels = pygame.surfarray.pixels2d(self.screen)
+        if tiles is None or len(tiles) > self.full_share*self.tile_count():
+            pixels[...] = frame
+            del pixels
+            pygame.display.flip()
+            count = self.tile_count()
+        else:
+            rects = []
+            for tx, ty in tiles:
+                x0, y0 = tx*TILE, ty*TILE
+                x1 = min(x0 + TILE, self.width)
+                y1 = min(y0 + TILE, self.height)
+                pixels[x0:x1, y0:y1] = frame[x0:x1, y0:y1]
+                rects.append(pygame.Rect(x0, y0, x1 - x0, y1 - y0))
+            del pixels
+            if rects:
+                pygame.display.update(rects)
+            count = len(rects)
+        if self.shown is None:
+            self.shown = frame.copy()
+        else:
+            np.copyto(self.shown, frame)
+        return count
+
+    def tile_count(self):
+        return (-(-self.width//TILE))*(-(-self.height//TILE))
+
+    # The (x, y) numbers of the tiles with any changed pixel in them.
+    def changed_tiles(self, changed):
+        across = -(-self.width//TILE)
+        down = -(-self.height//TILE)
+        padded = np.zeros((across*TILE, down*TILE), dtype=bool)
+        padded[:self.width, :self.height] = changed
+        tiles = padded.reshape(across, TILE, down, TILE).any(axis=(1, 3))
+        return np.argwhere(tiles).tolist()
@@ -0,0 +1,124 @@
+"""
+Plays back a 3D Brownian tree from a growth log (see growth_log.py) without
+growing it again: the spheres are drawn straight from the log, so no distance
+checks are done and the tree is exactly the one that was grown.
+
+    python replay.py tree.log                  grow it again at 500 spheres/s
+    python replay.py tree.log --speed 5000     faster
+    python replay.py tree.log --step 200000    the tree as it was at step 200000
+                                               (the engine's attempt count)
+    python replay.py tree.log --step 200000 --speed 100
+                                               and carry on from there
+
+While it plays, space pauses, and the up and down arrows double and halve the
+speed. The mouse moves the tree the same way as in main.py.
+"""
+import argparse
+
+import numpy as np
+
+from growth_log import read_log
+from sphere_batch import SphereBatch
+from direct.showbase.ShowBase import ShowBase
+from direct.task import Task
+from panda3d.core import AmbientLight, DirectionalLight
+from panda3d.core import LVector3, Mat4, VBase4
+
+
+class Replay(ShowBase):
+
+    def __init__(self, path, step=None, speed=500):
+        ShowBase.__init__(self)
+        self.sphere_size, self.records = read_log(path)
+        # Position, color and parent of every record, as plain lists.
+        self.positions = list(map(tuple, self.records["position"].tolist()))
+        self.colors = [VBase4(*color) for color in self.records["color"].tolist()]
+        self.parents = self.records["parent"].tolist()
+        # Children of each sphere so far. A sphere burns out with its second
+        # child, and can then be merged into its chunk.
+        self.children = np.zeros(len(self.records), dtype=np.int8)
+        self.speed = speed
+        self.paused = False
+        self.shown = 0
+        # Fraction of a sphere left over from the last frame.
+        self.owed = 0.0
+
+        # The same look as main.py.
+        base.setBackgroundColor(1, 1, 1)
+        ambientLight = AmbientLight("ambientLight")
+        ambientLight.setColor((0.3, 0.4, 0.5, 1))
+        directionalLight = DirectionalLight("directionalLight")
+        directionalLight.setDirection(LVector3(0, 5, -5))
+        directionalLight.setColor((0.9, 0.9, 0.9, 1))
+        self.disableMouse()
+        self.camera.setPos(0, -300, 0)
+        mat = Mat4(camera.getMat())
+        mat.invertInPlace()
+        base.mouseInterfaceNode.setMat(mat)
+        base.enableMouse()
+
+        self.spheres = SphereBatch(self.loader, render, self.sphere_size,
+                                   directionalLight, ambientLight)
+        if step is not None:
+            # Records are in step order, so everything up to the step is
+            # the front of the log.
+            self.show(int(np.searchsorted(self.records["step"], step,
+                                          side="right")))
+            if not speed:
+                self.spheres.merge(len(self.spheres.waiting))
+                return
+
+        self.accept("space", self.toggle_pause)
+        self.accept("arrow_up", self.set_speed, [2.0])
+        self.accept("arrow_down", self.set_speed, [0.5])
+        self.taskMgr.add(self.play, "play")
+        self.taskMgr.doMethodLater(0.5, self.merge_spheres, "merge_spheres")
+
+    # Draws the records up to (not including) record number end.
+    def show(self, end):
+        end = min(end, len(self.positions))
+        spheres = self.spheres
+        for i in range(self.shown, end):
+            spheres.add(self.positions[i], self.colors[i], i)
+            parent = self.parents[i]
+            if parent >= 0:
+                self.children[parent] += 1
+                if self.children[parent] == 2:
+                    spheres.retire(parent)
+        self.shown = end
+        spheres.collect()
+
+    def play(self, task):
+        if not self.paused:
+            self.owed += self.speed*globalClock.getDt()
+            count = int(self.owed)
+            self.owed -= count
+            self.show(self.shown + count)
+        if self.shown == len(self.positions):
+            return Task.done
+        return Task.cont
+
+    def merge_spheres(self, task):
+        self.spheres.merge()
+        return Task.again
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+
+    def set_speed(self, factor):
+        self.speed *= factor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play back a growth log.")
+    parser.add_argument("log", help="growth log written by main.py or growth_engine.py")
+    parser.add_argument("--step", type=int, default=None,
+                        help="start with the tree as it was at this step")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="spheres per second (default 500, or 0, a still "
+                        "picture, with --step)")
+    args = parser.parse_args()
+    speed = args.speed
+    if speed is None:
+        speed = 0 if args.step is not None else 500
+    Replay(args.log, args.step, speed).run()
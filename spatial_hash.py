@@ -0,0 +1,96 @@
+"""
+Uniform voxel hash for the 3D Brownian tree. Space is cut into cubes of
+cell_size on a side and every sphere is filed under the cube its center falls
+in, either as the center itself or as some other item standing for it, like
+its index in a list of spheres. Asking for the spheres near a point then only
+looks at the handful of cubes around it instead of every sphere in the tree,
+so the cost of a growth attempt stays about the same no matter how big the
+tree gets.
+"""
+from math import floor
+
+import numpy as np
+
+
+class SpatialHash:
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        # cell (i, j, k) -> list of the items in that cell
+        self.cells = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def cell_of(self, point):
+        size = self.cell_size
+        return (floor(point[0]/size), floor(point[1]/size), floor(point[2]/size))
+
+    # Files item under the cell that point is in. Without an item, the point
+    # itself is stored.
+    def insert(self, point, item=None):
+        if item is None:
+            item = point
+        key = self.cell_of(point)
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [item]
+        else:
+            bucket.append(item)
+        self.count += 1
+
+    def extend(self, points):
+        for point in points:
+            self.insert(point)
+
+    # Files a whole array of points (n x 3) at once, with item i standing for
+    # point i (items defaults to 0 to n - 1). The cells come out the same as
+    # inserting them one at a time, in order, but it is done with NumPy, which
+    # is what makes loading a checkpoint of a big tree quick.
+    def insert_array(self, points, items=None):
+        if len(points) == 0:
+            return
+        if items is None:
+            items = np.arange(len(points))
+        keys = np.floor(np.asarray(points, dtype=np.float64)/self.cell_size)
+        keys = keys.astype(np.int64)
+        # Each cell packed into one number, so the sort is a 1D one. A stable
+        # sort keeps the items in each cell in their original order.
+        shifted = keys - keys.min(axis=0)
+        span = shifted.max(axis=0) + 1
+        packed = (shifted[:, 0]*span[1] + shifted[:, 1])*span[2] + shifted[:, 2]
+        order = np.argsort(packed, kind="stable")
+        packed = packed[order]
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, packed[1:] != packed[:-1]])
+        ends = np.r_[starts[1:], len(keys)].tolist()
+        sorted_items = np.asarray(items)[order].tolist()
+        cells = self.cells
+        for key, start, end in zip(map(tuple, keys[starts].tolist()),
+                                   starts.tolist(), ends):
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = sorted_items[start:end]
+            else:
+                bucket.extend(sorted_items[start:end])
+        self.count += len(sorted_items)
+
+    def nearby(self, point, reach):
+        # Every stored item in the cells touching the cube of
+        # half-width reach around point, as a list. Anything within reach of point is
+        # guaranteed to be in there, along with some that are further away,
+        # so the caller still has to measure.
+        size = self.cell_size
+        i0, i1 = floor((point[0] - reach)/size), floor((point[0] + reach)/size)
+        j0, j1 = floor((point[1] - reach)/size), floor((point[1] + reach)/size)
+        k0, k1 = floor((point[2] - reach)/size), floor((point[2] + reach)/size)
+        cells = self.cells
+        items = []
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for k in range(k0, k1 + 1):
+                    bucket = cells.get((i, j, k))
+                    if bucket:
+                        items.extend(bucket)
+        return items
@@ -0,0 +1,165 @@
+"""
+Drawing the spheres of the 3D Brownian tree in main.py.
+
+The original way, load_single_sphere(), loads the ball model, makes a
+Material and attaches both lights for every sphere, so each sphere adds about
+three nodes and its own render state, and is its own draw call. That is fine
+for a few thousand spheres and then the frame rate falls apart.
+
+SphereBatch loads the model once and puts the material and the two lights on
+one parent node that every sphere inherits from. The spheres are instances of
+the one model, grouped under RigidBodyCombiner nodes of batch_size spheres
+each. A RigidBodyCombiner turns its children into a few combined Geoms (one
+per color), so the number of draw calls grows with spheres/batch_size instead
+of with the number of spheres. Only the batch still being filled has to be
+recombined, once per frame at most, when collect() is called.
+
+A sphere that has burned out never changes again. Handing it to retire()
+queues it for the chunk of space (chunk_size on a side) it sits in, and
+merge() later moves the queued spheres out of their batches and flattens each
+chunk into a single Geom with flattenStrong(). merge() only does a few chunks
+per call, so it can run every so often from a task of its own instead of in
+the middle of growing the tree.
+"""
+from math import floor
+
+from panda3d.core import Material, NodePath, RigidBodyCombiner
+
+
+# Loads a sphere the original way: its own copy of the model, its own
+# material and its own light nodes.
+def load_single_sphere(loader, parent, position, size, color,
+                       directionalLight, ambientLight, model="ball"):
+    # Load a sphere.
+    sphere = loader.loadModel(model)
+    sphere.setScale(size, size, size)
+    sphere.setPos(position)
+
+    # Sets the sphere color.
+    sphere.setColor(color)
+    sphere.reparentTo(parent)
+
+    # Make the sphere a material (to behave with the light).
+    material = Material()
+    material.setShininess(10.0)
+    sphere.setMaterial(material)
+
+    # Set lighting on the sphere.
+    sphere.setLight(sphere.attachNewNode(directionalLight))
+    sphere.setLight(sphere.attachNewNode(ambientLight))
+    return sphere
+
+
+class SphereBatch:
+
+    def __init__(self, loader, parent, size, directionalLight, ambientLight,
+                 model="ball", batch_size=256, chunk_size=50):
+        self.size = size
+        self.batch_size = batch_size
+        self.chunk_size = float(chunk_size)
+        self.model = loader.loadModel(model)
+
+        # Everything the spheres have in common goes on one parent node.
+        self.root = parent.attachNewNode("spheres")
+        material = Material()
+        material.setShininess(10.0)
+        self.root.setMaterial(material)
+        self.root.setLight(self.root.attachNewNode(directionalLight))
+        self.root.setLight(self.root.attachNewNode(ambientLight))
+
+        # RigidBodyCombiner NodePaths, the last one is being filled.
+        self.batches = []
+        self.in_batch = 0
+        self.count = 0
+        self.dirty = False
+        # Batches that lost spheres to a chunk and need recombining.
+        self.dirty_batches = set()
+
+        # key -> (sphere NodePath, index of its batch) for every sphere
+        # added with a key that hasn't been merged into a chunk yet.
+        self.live = {}
+        # chunk (i, j, k) -> flattened NodePath, and the keys of the spheres
+        # waiting to be merged into each chunk, oldest chunk first.
+        self.chunks = {}
+        self.waiting = {}
+
+    def __len__(self):
+        return self.count
+
+    # Adds a sphere. Give it a key to be able to retire() it later.
+    def add(self, position, color, key=None):
+        if not self.batches or self.in_batch == self.batch_size:
+            # The old batch is full. Combine it one last time and start a
+            # new one.
+            self.collect()
+            self.batches.append(self.root.attachNewNode(
+                RigidBodyCombiner("spheres%d" % len(self.batches))))
+            self.in_batch = 0
+
+        sphere = self.batches[-1].attachNewNode("sphere")
+        sphere.setScale(self.size, self.size, self.size)
+        sphere.setPos(position)
+        sphere.setColor(color)
+        self.model.instanceTo(sphere)
+        self.in_batch += 1
+        self.count += 1
+        self.dirty = True
+        if key is not None:
+            self.live[key] = (sphere, len(self.batches) - 1)
+        return sphere
+
+    # Recombines the batch being filled if anything was added to it, and any
+    # batch that lost spheres to a chunk. Call it once a frame, after the
+    # spheres for that frame have been added.
+    def collect(self):
+        if self.dirty:
+            self.batches[-1].node().collect()
+            self.dirty = False
+        for i in self.dirty_batches:
+            self.batches[i].node().collect()
+        self.dirty_batches.clear()
+
+    # Queues the sphere added with key for merging into its chunk. Nothing
+    # changes on screen until merge() gets to that chunk.
+    def retire(self, key):
+        entry = self.live.get(key)
+        if entry is None:
+            return
+        position = entry[0].getPos()
+        size = self.chunk_size
+        chunk = (floor(position[0]/size),
+                 floor(position[1]/size),
+                 floor(position[2]/size))
+        self.waiting.setdefault(chunk, []).append(key)
+
+    # Merges the waiting spheres into their chunks, at most max_chunks
+    # chunks per call. Each chunk is rebuilt off to the side from its old
+    # Geom and the new spheres, flattened, and then swapped in. Returns the
+    # number of chunks merged.
+    def merge(self, max_chunks=4):
+        merged = 0
+        while self.waiting and merged < max_chunks:
+            chunk = next(iter(self.waiting))
+            keys = self.waiting.pop(chunk)
+
+            staging = NodePath("chunk")
+            old = self.chunks.get(chunk)
+            if old is not None:
+                old.getChildren().reparentTo(staging)
+                old.removeNode()
+            for key in keys:
+                sphere, batch = self.live.pop(key)
+                # wrtReparentTo keeps the position, scale and color.
+                sphere.wrtReparentTo(staging)
+                self.dirty_batches.add(batch)
+            # Every sphere is an instance of the model's ModelRoot, and
+            # flattening stops at ModelNodes, so they have to go first or
+            # nothing is merged at all.
+            staging.clearModelNodes()
+            staging.flattenStrong()
+            staging.reparentTo(self.root)
+            self.chunks[chunk] = staging
+            merged += 1
+
+        self.collect()
+        return merged
@@ -0,0 +1,166 @@
+"""
+All the free particles of a 2D Brownian tree in NumPy arrays, stepped
+together, for the pygame scripts.
+
+Each free particle in the scripts is a pygame sprite that looks after itself
+in Particle.update(), so every tick is a Python loop over the particles and
+more than a few hundred of them slow everything down. A Swarm keeps the
+positions and speeds of all of them in four arrays and does what
+Particle.update() does to every particle at once:
+
+    a particle that overlaps another free one gets a new random speed
+    otherwise one that overlaps the tree (a TreeBitmap) sticks to it
+    particles bounce off the window edges (onEdge)
+    a particle with no speed gets a random one
+    every particle moves by its speed
+
+The sprites see each other move during a tick, one after the other, while
+the swarm works from where everything was at the start of the tick, so the
+trees are the same kind of tree but not the same trees. Hundreds of
+thousands of walkers are fine. Drawing them is up to a Renderer (see
+renderer.py).
+"""
+import numpy as np
+
+
+class Swarm:
+    """
+    width, height - the window size
+    size - particle size in pixels
+    max_speed - largest step along x or y in a tick
+    tree - the TreeBitmap the particles stick to
+    """
+
+    def __init__(self, width, height, size, max_speed, tree, seed=None):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.max_speed = max_speed
+        self.tree = tree
+        self.rng = np.random.default_rng(seed)
+        # Every particle's pixel offsets from its top left corner.
+        dx, dy = np.meshgrid(np.arange(size), np.arange(size), indexing="ij")
+        self.footprint = (dx.ravel().astype(np.int32),
+                          dy.ravel().astype(np.int32))
+        self.clear()
+
+    def clear(self):
+        self.x = np.zeros(0, dtype=np.int32)
+        self.y = np.zeros(0, dtype=np.int32)
+        self.vx = np.zeros(0, dtype=np.int32)
+        self.vy = np.zeros(0, dtype=np.int32)
+        # The top left corners of the ones that stuck in the last step.
+        self.stuck_x = self.stuck_y = self.x
+        # Particles stuck to the tree so far.
+        self.stuck = 0
+
+    def __len__(self):
+        return len(self.x)
+
+    def random_speeds(self, n):
+        return self.rng.integers(-self.max_speed, self.max_speed + 1,
+                                 size=(2, n), dtype=np.int32)
+
+    # Adds particles with top left corners x and y and random speeds.
+    def spawn(self, x, y):
+        vx, vy = self.random_speeds(len(x))
+        self.x = np.concatenate([self.x, np.asarray(x, dtype=np.int32)])
+        self.y = np.concatenate([self.y, np.asarray(y, dtype=np.int32)])
+        self.vx = np.concatenate([self.vx, vx])
+        self.vy = np.concatenate([self.vy, vy])
+
+    # Adds n particles near the four corners of the window, no more than
+    # tenth_x and tenth_y pixels in, the same as the scripts' NEW event.
+    def spawn_corners(self, n, tenth_x, tenth_y):
+        if n <= 0:
+            return
+        rng = self.rng
+        tenth_x, tenth_y = int(tenth_x), int(tenth_y)
+        corner = rng.integers(0, 4, size=n)
+        # Top left, bottom right, top right and bottom left, in that order.
+        right = (corner == 1) | (corner == 2)
+        bottom = (corner == 1) | (corner == 3)
+        x = rng.integers(0, tenth_x + 1, size=n) + right*(self.width - tenth_x)
+        y = rng.integers(0, tenth_y + 1, size=n) + bottom*(self.height - tenth_y)
+        self.spawn(x, y)
+
+    # True for every particle that overlaps another one. Two particles
+    # overlap when their corners are less than size apart along both x and
+    # y, so this counts the corners in the square around each one with a
+    # summed area table of where the corners are.
+    def overlapping(self):
+        size = self.size
+        margin = self.tree.margin
+        width, height = self.tree.cells.shape
+        cx = np.clip(self.x + margin, 0, width - 1)
+        cy = np.clip(self.y + margin, 0, height - 1)
+        counts = np.bincount(cx*height + cy, minlength=width*height)
+        table = np.zeros((width + 1, height + 1), dtype=np.int32)
+        table[1:, 1:] = counts.reshape(width, height).cumsum(0).cumsum(1)
+        x0 = np.clip(cx - size + 1, 0, width)
+        x1 = np.clip(cx + size, 0, width)
+        y0 = np.clip(cy - size + 1, 0, height)
+        y1 = np.clip(cy + size, 0, height)
+        total = table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
+        # Every particle counts itself.
+        return total > 1
+
+    # Bounces particles off the window edges, like Particle.onEdge(): only
+    # the first edge a particle is over counts. Returns which ones bounced.
+    def on_edge(self):
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        left = x <= 0
+        top = ~left & (y <= 0)
+        right = ~left & ~top & (x + self.size >= self.width)
+        bottom = ~left & ~top & ~right & (y + self.size >= self.height)
+        vx[left] = np.abs(vx[left])
+        vy[top] = np.abs(vy[top])
+        vx[right] = -np.abs(vx[right])
+        vy[bottom] = -np.abs(vy[bottom])
+        return left | top | right | bottom
+
+    # One tick for every particle. Returns the number that stuck.
+    def step(self):
+        if not len(self.x):
+            self.stuck_x = self.stuck_y = self.x
+            return 0
+        crowded = self.overlapping()
+        stuck = ~crowded & self.tree.hits_many(self.x, self.y, self.size)
+        if crowded.any():
+            self.vx[crowded], self.vy[crowded] = self.random_speeds(int(crowded.sum()))
+
+        # The ones that stuck stop where they are and leave the swarm.
+        self.stuck_x, self.stuck_y = self.x[stuck], self.y[stuck]
+        if stuck.any():
+            free = ~stuck
+            self.x, self.y = self.x[free], self.y[free]
+            self.vx, self.vy = self.vx[free], self.vy[free]
+            self.tree.add_many(self.stuck_x, self.stuck_y, self.size)
+            self.stuck += len(self.stuck_x)
+
+        self.on_edge()
+        still = (self.vx == 0) & (self.vy == 0)
+        if still.any():
+            self.vx[still], self.vy[still] = self.random_speeds(int(still.sum()))
+        self.x = self.x + self.vx
+        self.y = self.y + self.vy
+        return len(self.stuck_x)
+
+    # The window pixels covered by particles with top left corners x and y.
+    def pixels(self, x, y):
+        size = self.size
+        # Only particles partly off the window need every pixel checked.
+        whole = ((x >= 0) & (y >= 0) & (x <= self.width - size)
+                 & (y <= self.height - size))
+        edge_x, edge_y = x[~whole], y[~whole]
+        if len(edge_x):
+            x, y = x[whole], y[whole]
+        px = (x[:, None] + self.footprint[0]).ravel()
+        py = (y[:, None] + self.footprint[1]).ravel()
+        if len(edge_x):
+            ex = (edge_x[:, None] + self.footprint[0]).ravel()
+            ey = (edge_y[:, None] + self.footprint[1]).ravel()
+            inside = (ex >= 0) & (ex < self.width) & (ey >= 0) & (ey < self.height)
+            px = np.concatenate([px, ex[inside]])
+            py = np.concatenate([py, ey[inside]])
+        return px, py
@@ -0,0 +1,35 @@
+"""
+The vectors from vector_lattice.py have to be the very ones the original
+calculation found, or trees grown from the same seed would change.
+"""
+import numpy as np
+import pytest
+
+import vector_lattice
+from vector_lattice import calculate_vectors, legacy_vectors, possible_vectors
+
+
+@pytest.mark.parametrize("sphere_size", range(1, 41))
+def test_same_vectors_as_legacy(sphere_size):
+    radius = sphere_size/1.5
+    assert set(calculate_vectors(radius)) == set(legacy_vectors(radius))
+
+
+# Same order too, which keeps seeded trees the same.
+@pytest.mark.parametrize("sphere_size", [1, 5, 8, 9, 20])
+def test_same_order_as_legacy(sphere_size):
+    radius = sphere_size/1.5
+    assert calculate_vectors(radius) == legacy_vectors(radius)
+
+
+def test_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_lattice, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_lattice, "_vectors", {})
+    worked_out = possible_vectors(12)
+    path = vector_lattice.cache_path(12)
+    assert np.load(path).tolist() == [list(vector) for vector in worked_out]
+
+    # Read back from the disk, not from memory.
+    monkeypatch.setattr(vector_lattice, "_vectors", {})
+    assert possible_vectors(12) == worked_out
+    assert possible_vectors(12) == calculate_vectors(12/1.5)
@@ -0,0 +1,112 @@
+"""
+The stuck particles of a 2D Brownian tree as a bitmap, one bool a pixel, for
+the pygame scripts.
+
+pygame.sprite.spritecollideany(particle, tree) checks the particle against
+every particle in the tree, so every tick gets slower as the tree grows.
+Looking the particle's rect up in the bitmap only looks at the pixels under
+it, however big the tree is. It gives the same answer: a rect hits the tree
+if any pixel inside it is one a tree particle covers, which is when
+Rect.colliderect would say they overlap.
+
+The bitmap is indexed [x, y], the same way round as pygame.surfarray, and
+reaches margin pixels past every edge of the window, since free particles go
+a little way off the window before they bounce back. The _many methods do
+the same for whole arrays of squares (see swarm.py).
+"""
+import numpy as np
+
+
+class TreeBitmap:
+
+    def __init__(self, width, height, margin=0):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.cells = np.zeros((width + 2*margin, height + 2*margin), dtype=bool)
+        # (x, y, width, height) of everything added, in order.
+        self.squares = []
+        self._clear_box()
+
+    # The box around everything in the bitmap. Most free particles are
+    # nowhere near the tree, and checking the box is much cheaper than
+    # asking NumPy about the pixels.
+    def _clear_box(self):
+        self.left = self.top = 1 << 30
+        self.right = self.bottom = -(1 << 30)
+
+    # The part of the bitmap under rect, cut off at the edges.
+    def _area(self, rect):
+        m = self.margin
+        x0 = max(rect.left + m, 0)
+        y0 = max(rect.top + m, 0)
+        x1 = min(rect.right + m, self.cells.shape[0])
+        y1 = min(rect.bottom + m, self.cells.shape[1])
+        return self.cells[x0:max(x0, x1), y0:max(y0, y1)]
+
+    # Marks the pixels under rect as part of the tree.
+    def add(self, rect):
+        self._area(rect)[...] = True
+        self.squares.append((rect.left, rect.top, rect.width, rect.height))
+        self.left = min(self.left, rect.left)
+        self.top = min(self.top, rect.top)
+        self.right = max(self.right, rect.right)
+        self.bottom = max(self.bottom, rect.bottom)
+
+    # True if rect overlaps the tree.
+    def hits(self, rect):
+        if (rect.right <= self.left or rect.left >= self.right
+                or rect.bottom <= self.top or rect.top >= self.bottom):
+            return False
+        return self._area(rect).any()
+
+    # The bitmap indexes of the pixels under squares of the given size with
+    # top left corners x and y, one row of them per square. Anything past
+    # the margin is moved onto its edge.
+    def _squares(self, x, y, size):
+        offsets = np.arange(size)
+        m = self.margin
+        width, height = self.cells.shape
+        px = np.clip(np.asarray(x)[:, None] + (offsets + m), 0, width - 1)
+        py = np.clip(np.asarray(y)[:, None] + (offsets + m), 0, height - 1)
+        return px[:, :, None], py[:, None, :]
+
+    # add() for many squares at once.
+    def add_many(self, x, y, size):
+        if not len(x):
+            return
+        px, py = self._squares(x, y, size)
+        self.cells[px, py] = True
+        self.squares.extend((sx, sy, size, size)
+                            for sx, sy in zip(np.asarray(x).tolist(),
+                                              np.asarray(y).tolist()))
+        self.left = min(self.left, int(np.min(x)))
+        self.top = min(self.top, int(np.min(y)))
+        self.right = max(self.right, int(np.max(x)) + size)
+        self.bottom = max(self.bottom, int(np.max(y)) + size)
+
+    # hits() for many squares at once: an array of True and False.
+    def hits_many(self, x, y, size):
+        px, py = self._squares(x, y, size)
+        return self.cells[px, py].reshape(len(x), -1).any(axis=1)
+
+    def clear(self):
+        self.cells[...] = False
+        self.squares = []
+        self._clear_box()
+
+    # The part of the bitmap inside the window.
+    def window(self):
+        m = self.margin
+        return self.cells[m:m + self.width, m:m + self.height]
+
+    # For every pixel of the window, the number (from 1) of the square that
+    # covered it first, or 0.
+    def order(self):
+        order = np.zeros((self.width, self.height), dtype=np.uint32)
+        # Backwards, so the first square to cover a pixel is the one left.
+        for i in range(len(self.squares) - 1, -1, -1):
+            x, y, width, height = self.squares[i]
+            x0, y0 = max(x, 0), max(y, 0)
+            order[x0:max(x0, x + width), y0:max(y0, y + height)] = i + 1
+        return order
@@ -0,0 +1,147 @@
+"""
+The possible vectors a new sphere can grow along: whole number (x, y, z)
+offsets about a radius (sphere size/1.5) away from the chosen sphere.
+
+They used to be found by stepping theta and phi through every degree from 0
+to 359 (129,600 points on a sphere), rounding each point and throwing out the
+repeats, every time the program started. The set of offsets is decided by
+exactly those 1 degree steps. A plain "every lattice point near the shell"
+enumeration picks up extra offsets the steps never land on, from sphere size
+8 up, which would change how the trees grow. So this works out the same
+points, but only the 360 sines and cosines are evaluated (the angles are the
+same for every point) and the products and rounding are done in one NumPy
+pass. Python's round() and NumPy's rint both round halves to even, and the
+products are the same floating point operations, so the offsets come out
+identical. They also come out in the same order, which keeps seeded trees the
+same.
+
+The vectors for each sphere size are kept in memory and written to
+vector_cache/ next to this file, so after the first run for a size startup
+doesn't have to work them out at all.
+
+    python vector_lattice.py --verify
+checks the vectors against the old calculation for sphere sizes 1 to 40, and
+so does tests/test_vector_lattice.py under pytest.
+"""
+from math import pi, sin, cos
+import argparse
+import os
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "vector_cache")
+
+# sphere size -> list of possible vectors
+_vectors = {}
+
+
+# The original calculation, kept to check against.
+def legacy_vectors(radius):
+    possible_vectors = []
+    # Turns degrees into radians 1 degree through 360 degrees.
+    thetas = [(float(i)*pi)/180 for i in range(360)]
+    phis = thetas
+
+    for theta in thetas:
+        for phi in phis:
+            x = radius * sin(theta) * cos(phi)
+            y = radius * sin(theta) * sin(phi)
+            z = radius * cos(theta)
+            x = int(round(x))
+            y = int(round(y))
+            z = int(round(z))
+
+            possible_vectors.append((x, y, z))
+
+    return list(set(possible_vectors))
+
+
+def calculate_vectors(radius):
+    angles = [(float(i)*pi)/180 for i in range(360)]
+    sines = np.array([sin(angle) for angle in angles])
+    cosines = np.array([cos(angle) for angle in angles])
+
+    # Row theta, column phi, the same products as the original loop:
+    # (radius * sin(theta)) * cos(phi) and so on.
+    ring = radius * sines
+    x = np.rint(ring[:, None] * cosines[None, :])
+    y = np.rint(ring[:, None] * sines[None, :])
+    z = np.rint(np.broadcast_to((radius * cosines)[:, None], x.shape))
+    points = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=1).astype(np.int64)
+
+    # The first time each offset shows up, in the order the original loop
+    # found them. Putting them into a set in that order gives the set the
+    # same layout as the original, so list(set(...)) has the same order too.
+    # Each offset is packed into one number so finding repeats is a 1D job.
+    span = 2*(int(radius) + 2) + 1
+    shifted = points + span//2
+    keys = (shifted[:, 0]*span + shifted[:, 1])*span + shifted[:, 2]
+    first = np.unique(keys, return_index=True)[1]
+    in_order = points[np.sort(first)]
+    return list(set(map(tuple, in_order.tolist())))
+
+
+def cache_path(sphere_size):
+    return os.path.join(CACHE_DIR, "vectors_%s.npy" % (sphere_size,))
+
+
+# The possible vectors for a sphere size, from memory, the disk cache, or
+# worked out (and then cached) if this size hasn't been seen before.
+def possible_vectors(sphere_size):
+    vectors = _vectors.get(sphere_size)
+    if vectors is not None:
+        return list(vectors)
+
+    path = cache_path(sphere_size)
+    try:
+        vectors = list(map(tuple, np.load(path).tolist()))
+    except (OSError, ValueError):
+        vectors = calculate_vectors(sphere_size/1.5)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Written under another name first so a half written file is
+            # never read back.
+            temp = path + ".%d.tmp" % os.getpid()
+            with open(temp, "wb") as f:
+                np.save(f, np.array(vectors, dtype=np.int32))
+            os.replace(temp, path)
+        except OSError:
+            # A read only install just works them out every time.
+            pass
+
+    _vectors[sphere_size] = vectors
+    return list(vectors)
+
+
+def verify(sizes):
+    for sphere_size in sizes:
+        radius = sphere_size/1.5
+        legacy = legacy_vectors(radius)
+        new = calculate_vectors(radius)
+        status = "ok" if new == legacy else "MISMATCH"
+        print("sphere size %2d: %5d vectors %s" % (sphere_size, len(new), status))
+        if new != legacy:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Work out and cache the possible vectors for sphere sizes.")
+    parser.add_argument("sizes", type=int, nargs="*",
+                        help="sphere sizes to cache (default 1 to 40)")
+    parser.add_argument("--verify", action="store_true",
+                        help="check against the original calculation instead")
+    args = parser.parse_args()
+    sizes = args.sizes or range(1, 41)
+
+    if args.verify:
+        raise SystemExit(0 if verify(sizes) else 1)
+    for sphere_size in sizes:
+        possible_vectors(sphere_size)
+    print("cached in %s" % CACHE_DIR)
+
+
+if __name__ == "__main__":
+    main()
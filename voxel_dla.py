@@ -0,0 +1,216 @@
+"""
+3D diffusion limited aggregation with real random walkers, for the walker
+mode of main.py (python main.py --walkers).
+
+Space is a grid of grid_size^3 cells held in one NumPy uint8 array, one byte
+a cell (128 MB for 512^3):
+
+    bit 0 (OCCUPIED)   the cell is part of the aggregate
+    bit 1 (ADJACENT)   the cell is next to the aggregate (a walker here sticks)
+    bits 2-4           which seed the cell's aggregate grew from
+
+Every walker takes one step along a random axis at each step(), all of them
+at once with NumPy. A walker that lands next to the aggregate sticks there and
+a new walker starts in its place on the launch sphere, a little further out
+than the aggregate reaches. Walkers that wander off past the kill sphere are
+started again on the launch sphere too, so none of them waste their time far
+away from the aggregate.
+
+Run it on its own to grow an aggregate without a window:
+
+    python voxel_dla.py --grid 512 --walkers 20000 --particles 50000 -o dla.npz
+"""
+import argparse
+import time
+
+import numpy as np
+
+OCCUPIED = 1
+ADJACENT = 2
+SEED_SHIFT = 2
+MAX_SEEDS = 8
+
+MOVES = np.array([[1, 0, 0], [-1, 0, 0],
+                  [0, 1, 0], [0, -1, 0],
+                  [0, 0, 1], [0, 0, -1]], dtype=np.int32)
+
+
+class VoxelDLA:
+    """
+    seeds - the cells (x, y, z) the aggregate starts from, given as offsets
+            from the center of the grid; at most eight
+    grid_size - cells on a side
+    walkers - most walkers stepping at once
+
+    Walkers crowding round a small aggregate stick to the first thing they
+    touch and grow a solid ball instead of branches, so there is one walker
+    for every cell of the aggregate, up to the most allowed.
+    """
+
+    def __init__(self, seeds=((0, 0, 0),), grid_size=512, walkers=10000,
+                 seed=None):
+        if not 0 < len(seeds) <= MAX_SEEDS:
+            raise ValueError("between 1 and %d seeds, not %d"
+                             % (MAX_SEEDS, len(seeds)))
+        self.grid_size = grid_size
+        self.center = grid_size//2
+        self.grid = np.zeros((grid_size,)*3, dtype=np.uint8)
+        self.rng = np.random.default_rng(seed)
+        self.steps = 0
+        self.walker_steps = 0
+        # Every cell added to the aggregate, in order, and the seed each one
+        # grew from.
+        self.cells = []
+        self.cell_seeds = []
+        # How far the aggregate reaches from the center of the grid.
+        self.reach = 0.0
+
+        cells = np.array(seeds, dtype=np.int32).reshape(-1, 3) + self.center
+        self.occupy(cells, np.arange(len(cells)))
+        self.max_walkers = walkers
+        self.walkers = self.launch(min(walkers, len(self.cells)))
+
+    # The furthest out a walker starts and how far it may wander before it
+    # is started again.
+    @property
+    def launch_radius(self):
+        return self.reach + 5
+
+    @property
+    def kill_radius(self):
+        return min(2*self.launch_radius + 10, self.grid_size//2 - 2)
+
+    # True once the aggregate has grown to the edge of the grid.
+    def finished(self):
+        return self.launch_radius >= self.grid_size//2 - 3
+
+    # n walkers at random points on the launch sphere.
+    def launch(self, n):
+        directions = self.rng.normal(size=(n, 3))
+        directions /= np.sqrt((directions*directions).sum(axis=1))[:, None]
+        cells = np.rint(directions*self.launch_radius).astype(np.int32)
+        return cells + self.center
+
+    # Adds cells (an n x 3 array) to the aggregate, grown from the given
+    # seeds, and marks the cells around them.
+    def occupy(self, cells, seeds):
+        grid = self.grid
+        x, y, z = cells[:, 0], cells[:, 1], cells[:, 2]
+        grid[x, y, z] |= OCCUPIED | (seeds.astype(np.uint8) << SEED_SHIFT)
+        for move in MOVES:
+            grid[x + move[0], y + move[1], z + move[2]] |= ADJACENT
+        offsets = cells - self.center
+        self.reach = max(self.reach,
+                         float(np.sqrt((offsets*offsets).sum(axis=1).max())))
+        self.cells.extend(map(tuple, offsets.tolist()))
+        self.cell_seeds.extend(seeds.tolist())
+
+    # The seed of the aggregate next to each of the cells: the first
+    # occupied neighbor's.
+    def neighbor_seeds(self, cells):
+        grid = self.grid
+        seeds = np.zeros(len(cells), dtype=np.int64)
+        found = np.zeros(len(cells), dtype=bool)
+        for move in MOVES:
+            neighbor = cells + move
+            flags = grid[neighbor[:, 0], neighbor[:, 1], neighbor[:, 2]]
+            new = ~found & (flags & OCCUPIED != 0)
+            seeds[new] = flags[new] >> SEED_SHIFT
+            found |= new
+        return seeds
+
+    # Moves every walker one step. Returns the cells that stuck, as offsets
+    # from the center of the grid, and the seed each one grew from.
+    def step(self):
+        walkers = self.walkers
+        grid = self.grid
+        moves = MOVES[self.rng.integers(0, 6, len(walkers))]
+        walkers += moves
+
+        flags = grid[walkers[:, 0], walkers[:, 1], walkers[:, 2]]
+        # A walker that was next to a cell that only joined the aggregate
+        # in the last step can walk right into it. It sticks where it came
+        # from instead.
+        inside = flags & OCCUPIED != 0
+        if inside.any():
+            walkers[inside] -= moves[inside]
+            back = walkers[inside]
+            flags[inside] = grid[back[:, 0], back[:, 1], back[:, 2]]
+
+        offsets = walkers - self.center
+        far = (offsets*offsets).sum(axis=1) > self.kill_radius**2
+        if far.any():
+            walkers[far] = self.launch(int(far.sum()))
+            flags[far] = 0
+
+        stuck = np.flatnonzero((flags & ADJACENT != 0) & (flags & OCCUPIED == 0))
+        self.steps += 1
+        self.walker_steps += len(walkers)
+        if not len(stuck):
+            return [], []
+
+        # Two walkers can land on the same cell; the first one gets it.
+        cells = walkers[stuck]
+        keys = np.ravel_multi_index(cells.T, self.grid.shape)
+        first = np.sort(np.unique(keys, return_index=True)[1])
+        cells = cells[first]
+        seeds = self.neighbor_seeds(cells)
+        start = len(self.cells)
+        self.occupy(cells, seeds)
+        walkers[stuck] = self.launch(len(stuck))
+        more = min(self.max_walkers, len(self.cells)) - len(walkers)
+        if more > 0:
+            self.walkers = np.concatenate([walkers, self.launch(more)])
+        return self.cells[start:], self.cell_seeds[start:]
+
+    # Steps until n more cells have stuck, the aggregate reaches the edge
+    # or max_steps steps have been taken. Returns the number added.
+    def run(self, n, max_steps=None):
+        start = len(self.cells)
+        steps = 0
+        while len(self.cells) - start < n and not self.finished():
+            if max_steps is not None and steps >= max_steps:
+                break
+            self.step()
+            steps += 1
+        return len(self.cells) - start
+
+    def save(self, path):
+        np.savez_compressed(path,
+                            cells=np.array(self.cells, dtype=np.int32),
+                            seeds=np.array(self.cell_seeds, dtype=np.int8),
+                            grid_size=self.grid_size,
+                            steps=self.steps)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Grow a 3D aggregate from random walkers on a voxel grid.")
+    parser.add_argument("--grid", type=int, default=512,
+                        help="cells on a side of the grid (default 512)")
+    parser.add_argument("--walkers", type=int, default=10000,
+                        help="most walkers stepping at once (default 10000)")
+    parser.add_argument("--particles", type=int, default=20000,
+                        help="stop once this many cells have stuck (default 20000)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed, for a repeatable aggregate")
+    parser.add_argument("-o", "--output", default="dla.npz",
+                        help="where to write the cells (default dla.npz)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dla = VoxelDLA(grid_size=args.grid, walkers=args.walkers, seed=args.seed)
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    dla.run(args.particles)
+    elapsed = time.perf_counter() - start
+    dla.save(args.output)
+    print("%d cells from %d steps of up to %d walkers in %.2f s (%.0f walker "
+          "steps/s, grid set up in %.2f s, reach %.0f cells), written to %s"
+          % (len(dla.cells), dla.steps, args.walkers, elapsed,
+             dla.walker_steps/max(elapsed, 1e-9), setup, dla.reach,
+             args.output))
+
+
+if __name__ == "__main__":
+    main()